@@ -0,0 +1,72 @@
+"""Microbenchmarks of the hot status paths `Q:` and `!:` of the protocol codec.
+
+Compares encoding the queries and parsing their replies through `codec` against the
+string handling the drivers used before (str.encode, decode, `split(",")` and
+`int()` per field).
+
+Run: python benchmarks/bench_codec.py [number]
+"""
+import re
+import sys
+import timeit
+
+from pyautolab_OptoSigma.helper import codec
+
+SHOT702_STATUS = b"     12345,-    67890,K,K,R"
+SHOT702_SPEED = b"S500F5000R200S500F5000R200"
+HSC103_STATUS = b"1234500,-6789000,42"
+HSC103_READY = b"0,1,0"
+# Parsers as owned by one driver of each model
+SHOT702_PARSERS = codec.SHOT702.parsers()
+HSC103_PARSERS = codec.HSC103.parsers()
+
+
+def string_encode(message: str) -> bytes:
+    return message.encode("ascii") + b"\r\n"
+
+
+CASES = [
+    (
+        "Shot702 Q: encode",
+        lambda: string_encode("Q:"),
+        lambda: codec.SHOT702.encode("status"),
+    ),
+    (
+        "Shot702 Q: decode",
+        lambda: [int(position.replace(" ", "")) for position in SHOT702_STATUS.decode("utf-8").split(",")[:2]],
+        lambda: SHOT702_PARSERS["status"](SHOT702_STATUS),
+    ),
+    (
+        "Shot702 ?:DW decode",
+        lambda: [int(value) for value in re.split("[SFR]", SHOT702_SPEED.decode("utf-8"))[1:]],
+        lambda: SHOT702_PARSERS["speed"](SHOT702_SPEED),
+    ),
+    (
+        "Hsc103 Q: encode",
+        lambda: string_encode("Q:"),
+        lambda: codec.HSC103.encode("status"),
+    ),
+    (
+        "Hsc103 Q: decode",
+        lambda: [int(position) for position in HSC103_STATUS.decode("utf-8").split(",")],
+        lambda: HSC103_PARSERS["status"](HSC103_STATUS),
+    ),
+    (
+        "Hsc103 !: decode",
+        lambda: [int(stage_status) for stage_status in HSC103_READY.decode("utf-8").split(",")],
+        lambda: HSC103_PARSERS["ready"](HSC103_READY),
+    ),
+]
+
+
+def main(number: int) -> None:
+    print(f"{'path':<22}{'string [μs]':>14}{'codec [μs]':>14}")
+    for name, string_path, codec_path in CASES:
+        assert string_path() == codec_path()
+        string_time = min(timeit.repeat(string_path, number=number, repeat=5)) / number * 1e6
+        codec_time = min(timeit.repeat(codec_path, number=number, repeat=5)) / number * 1e6
+        print(f"{name:<22}{string_time:>14.3f}{codec_time:>14.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if 1 < len(sys.argv) else 100_000)
@@ -0,0 +1,209 @@
+"""End-to-end throughput benchmarks of the drivers against the simulated controllers.
+
+Each driver runs on `SimulatedSerial`, which adds a fixed round-trip time to every
+message and scales the motion time. The Step and Cycle loops issue the same commands
+as `helper.tab.Step` and `helper.tab.Cycle`. Because those run on Qt timers, the
+loops here poll with `time.sleep` instead.
+
+Measured for each driver:
+
+- operations per second of the Step and Cycle loops
+- serial round trips per operation
+- `measure_positions` calls per second
+- setup cost: `open` (which includes `initialize` for Shot702) followed by the
+  `set_stage_speed` call of `setup_settings`
+- memory retained and peak memory per 10^5 Cycle operations, measured by tracemalloc
+  without latency and motion time
+
+The results are written as JSON. Every metric listed in the thresholds file is
+checked, and the exit status is 1 when one of them regresses. The thresholds assume
+the default parameters.
+
+Run: python benchmarks/throughput.py [--output results.json]
+"""
+import argparse
+import gc
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from pyautolab_OptoSigma.helper import storage
+from pyautolab_OptoSigma.helper.driver import StageController
+from pyautolab_OptoSigma.helper.simulator import SimulatedSerial, simulate
+from pyautolab_OptoSigma.helper.validation import move_times
+from pyautolab_OptoSigma.hsc103.driver import Hsc103
+from pyautolab_OptoSigma.shot702.driver import Shot702
+
+DRIVERS: dict[str, type[StageController]] = {"Shot702": Shot702, "Hsc103": Hsc103}
+THRESHOLDS = Path(__file__).with_name("thresholds.json")
+# Displacement[μm] and speed[μm/sec] of the benchmarked moves, as set on the tab
+DISTANCE = 100
+SPEED = 5000
+ACCELERATION_TIME = 1
+
+
+def connect(driver: type[StageController], line_latency: float, time_scale: float) -> StageController:
+    """Open a driver on a simulated controller and apply the settings of the tab."""
+    device = driver()
+    device.port = "loopback"
+    simulate(device, line_latency, time_scale)
+    device.open()
+    device.set_stage_speed(
+        axis=1, min=SPEED, max=SPEED, acceleration_time=ACCELERATION_TIME, original_reset_speed=None
+    )
+    return device
+
+
+def wait_ready(device: StageController, poll_interval: float) -> None:
+    while not device.is_ready()[0]:
+        time.sleep(poll_interval)
+
+
+def step_loop(device: StageController, operations: int, poll_interval: float, stop_time: float) -> None:
+    device.fix_origin((True, False, False))
+    for _ in range(operations):
+        wait_ready(device, poll_interval)
+        device.move_stages((DISTANCE, None, None), "M")
+        time.sleep(stop_time)
+
+
+def cycle_loop(device: StageController, operations: int, poll_interval: float, stop_time: float) -> None:
+    device.fix_origin((True, False, False))
+    for count in range(operations):
+        wait_ready(device, poll_interval)
+        device.move_stages((DISTANCE if count % 2 == 0 else 0, None, None))
+        time.sleep(stop_time)
+    device.emergency_stop()
+
+
+def measure_loop(
+    device: StageController, loop: Callable[..., None], operations: int, *args: Any
+) -> tuple[float, float]:
+    """Return operations per second and round trips per operation of a loop."""
+    serial: SimulatedSerial = device._ser  # type: ignore
+    count = serial.message_count
+    start = time.perf_counter()
+    loop(device, operations, *args)
+    elapsed = time.perf_counter() - start
+    return operations / elapsed, (serial.message_count - count) / operations
+
+
+def measure_setup(driver: type[StageController], line_latency: float, time_scale: float, repeat: int) -> float:
+    """Return the median setup time[msec]."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        device = connect(driver, line_latency, time_scale)
+        durations.append(time.perf_counter() - start)
+        device.close()
+    return float(np.median(durations)) * 1000
+
+
+def measure_positions_rate(device: StageController, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        device.measure_positions()
+    return calls / (time.perf_counter() - start)
+
+
+def measure_memory(driver: type[StageController], operations: int) -> tuple[float, float]:
+    """Return retained and peak memory[KiB] per 10^5 Cycle operations."""
+    device = connect(driver, 0.0, 1e9)
+    # Warm up caches of the codec and the simulator
+    cycle_loop(device, 100, 0.0, 0.0)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    cycle_loop(device, operations, 0.0, 0.0)
+    gc.collect()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    device.close()
+    scale = 1e5 / operations / 1024
+    return (after - before) * scale, (peak - before) * scale
+
+
+def benchmark(driver: type[StageController], args: argparse.Namespace) -> dict[str, float]:
+    # Speed up the simulated time so that a move takes `motion_time`
+    nominal = float(move_times(np.array([DISTANCE]), SPEED, SPEED, ACCELERATION_TIME)[0])
+    time_scale = nominal / args.motion_time if args.motion_time > 0 else 1e9
+    results: dict[str, float] = {}
+    results["setup_msec"] = measure_setup(driver, args.line_latency, time_scale, args.setup_repeat)
+    device = connect(driver, args.line_latency, time_scale)
+    try:
+        loop_args = (args.poll_interval, args.stop_time)
+        results["step_ops_per_sec"], results["step_round_trips_per_op"] = measure_loop(
+            device, step_loop, args.operations, *loop_args
+        )
+        results["cycle_ops_per_sec"], results["cycle_round_trips_per_op"] = measure_loop(
+            device, cycle_loop, args.operations, *loop_args
+        )
+        results["measure_positions_per_sec"] = measure_positions_rate(device, args.operations)
+    finally:
+        device.close()
+    results["memory_kib_per_1e5_ops"], results["peak_memory_kib_per_1e5_ops"] = measure_memory(
+        driver, args.memory_operations
+    )
+    return results
+
+
+def check(results: dict[str, dict[str, float]], thresholds: dict[str, dict[str, dict[str, float]]]) -> list[str]:
+    """Return the metrics outside their thresholds."""
+    violations = []
+    for driver, metrics in thresholds.items():
+        for metric, limit in metrics.items():
+            value = results.get(driver, {}).get(metric)
+            if value is None:
+                continue
+            if "min" in limit and value < limit["min"]:
+                violations.append(f"{driver}.{metric}: {value:.3f} < {limit['min']}")
+            if "max" in limit and limit["max"] < value:
+                violations.append(f"{driver}.{metric}: {value:.3f} > {limit['max']}")
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--line-latency", type=float, default=0.002, help="round trip of a message[sec]")
+    parser.add_argument("--motion-time", type=float, default=0.01, help="duration of a move[sec]")
+    parser.add_argument("--poll-interval", type=float, default=0.001, help="interval of ready polling[sec]")
+    parser.add_argument("--stop-time", type=float, default=0.0, help="stop time after each move[sec]")
+    parser.add_argument("--operations", type=int, default=200, help="operations of each loop")
+    parser.add_argument("--memory-operations", type=int, default=20000, help="operations of the memory run")
+    parser.add_argument("--setup-repeat", type=int, default=5, help="repetitions of the setup measurement")
+    parser.add_argument("--drivers", nargs="+", choices=list(DRIVERS), default=list(DRIVERS))
+    parser.add_argument("--thresholds", type=Path, default=THRESHOLDS)
+    parser.add_argument("--output", type=Path, help="file to write the results to, by default stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        # Keep the persisted origins of the user out of the measurement
+        storage.STATE_DIR = Path(state_dir)
+        results = {name: benchmark(DRIVERS[name], args) for name in args.drivers}
+
+    thresholds = json.loads(args.thresholds.read_text(encoding="utf-8")) if args.thresholds.exists() else {}
+    violations = check(results, thresholds)
+    report = {
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("thresholds", "output")},
+        "results": results,
+        "violations": violations,
+    }
+    text = json.dumps(report, indent=4, default=str)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text, encoding="utf-8")
+    for violation in violations:
+        print(f"Regression: {violation}", file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+from dataclasses import dataclass
+from typing import Callable
+
+DELIMITER = b"\r\n"
+
+
+@dataclass(frozen=True)
+class Reply:
+    """Format of a reply holding integers."""
+
+    # Number of integers to read. Fields after them (e.g. status flags) are ignored.
+    count: int
+    # Bytes separating the integers, e.g. b"SFR" for "S500F5000R200".
+    separators: bytes = b","
+    # Whether the integers are padded between the sign and the digits, e.g. "-     1000",
+    # which int() does not accept
+    padded: bool = False
+
+    def parser(self) -> Callable[[bytes], list[int]]:
+        """Return a parser of the reply writing the integers into a buffer of its own.
+
+        The parser raises `ValueError` if the reply has fewer integers than the format.
+        """
+        buffer = [0] * self.count
+        indices = range(self.count)
+        table = None if self.separators == b"," else bytes.maketrans(self.separators, b"," * len(self.separators))
+        delete = b" " if self.padded else b""
+        normalize = table is not None or self.padded
+
+        def parse(reply: bytes) -> list[int]:
+            if normalize:
+                # "S500F5000R200" -> "500,5000,200" and "-     1000" -> "-1000"
+                reply = reply.translate(table, delete).lstrip(b",")
+            # Fields are taken one at a time, and those after the integers are left unsplit.
+            for index in indices:
+                field, _, reply = reply.partition(b",")
+                buffer[index] = int(field)
+            return buffer
+
+        return parse
+
+
+@dataclass(frozen=True)
+class Command:
+    # Build the message without delimiter from the arguments
+    encode: Callable[..., bytes]
+    # Format of the reply. None when the reply is only an acknowledgement or a flag.
+    reply: Reply | None = None
+    # Whether sending the command again has the same effect as sending it once, so that
+    # it can be retried when the reply is lost.
+    idempotent: bool = True
+    # Number of leading arguments identifying the configuration the command sets, e.g.
+    # 1 for the axis. The last message of each configuration is sent again after a
+    # reconnect. None when the command sets no configuration.
+    configures: int | None = None
+
+
+class Codec:
+    """Encoder of the messages of one controller model and factory of their reply parsers.
+
+    Each command is defined once in a table. Messages are encoded to bytes directly.
+    Each driver takes its own parsers from `parsers`, which parse integers from bytes
+    into buffers preallocated for each command, so that drivers of the same model
+    never overwrite each other's replies.
+
+    Parameters
+    ----------
+    commands : dict[str, Command]
+        Command for each name.
+    """
+
+    def __init__(self, commands: dict[str, Command]) -> None:
+        self.commands = commands
+        # Messages encoded without arguments, e.g. the status queries
+        self._constants: dict[str, bytes] = {}
+
+    def encode(self, name: str, *args) -> bytes:
+        """Encode a command including the delimiter."""
+        if args:
+            return self.commands[name].encode(*args) + DELIMITER
+        message = self._constants.get(name)
+        if message is None:
+            message = self._constants[name] = self.commands[name].encode() + DELIMITER
+        return message
+
+    def parsers(self) -> dict[str, Callable[[bytes], list[int]]]:
+        """Return new parsers of the replies without delimiter for each command with a reply.
+
+        The list returned by a parser is reused by its next call, so copy it to keep it.
+        """
+        return {name: command.reply.parser() for name, command in self.commands.items() if command.reply}
+
+
+def _signed(value: int) -> bytes:
+    return b"%sP%d" % (b"-" if value < 0 else b"+", abs(value))
+
+
+def _axis_flags(axis: tuple[bool, ...]) -> bytes:
+    # Convert bool to binary number(False -> 0 -> "0", True -> 1 -> "1")
+    return b",".join(b"1" if selected else b"0" for selected in axis)
+
+
+def _optional_integers(values: tuple[int | None, ...]) -> bytes:
+    return b",".join(b"" if value is None else b"%d" % value for value in values)
+
+
+SHOT702 = Codec(
+    {
+        # Arguments: axis(1 or 2), division
+        "division": Command(lambda axis, division: b"S:%d%d" % (axis, division), configures=1),
+        # Reply: "coordinate of axis 1,coordinate of axis 2,ACK1,ACK2,ACK3"[pulse]
+        "status": Command(lambda: b"Q:", Reply(2, padded=True)),
+        # Reply: "R"(ready) or "B"(busy)
+        "ready": Command(lambda: b"!:"),
+        # Reply: "S<start>F<max>R<acceleration time>" for each axis[pps, msec]
+        "speed": Command(lambda: b"?:DW", Reply(6, b"SFR")),
+        # Arguments: mode(b"D" or b"V"), axis, start speed[pps], max speed[pps], acceleration time[msec]
+        "set_speed": Command(
+            lambda mode, axis, start, max, acc: b"%s:%dS%dF%dR%d" % (mode, axis, start, max, acc), configures=2
+        ),
+        # Arguments: axis option(b"1", b"2" or b"W"), pulses of the selected axes
+        "move_absolute": Command(lambda axis, *pulses: b"A:" + axis + b"".join(map(_signed, pulses))),
+        "move_relative": Command(
+            lambda axis, *pulses: b"M:" + axis + b"".join(map(_signed, pulses)), idempotent=False
+        ),
+        # Arguments: axis option, directions(b"+" or b"-") of the selected axes
+        "jog": Command(lambda axis, *directions: b"J:" + axis + b"".join(directions)),
+        "drive": Command(lambda: b"G:", idempotent=False),
+        "fix_origin": Command(lambda axis: b"R:" + axis, idempotent=False),
+        "home": Command(lambda axis: b"H:" + axis),
+        "stop": Command(lambda axis: b"L:" + axis),
+        "emergency_stop": Command(lambda: b"L:E"),
+    }
+)
+
+HSC103 = Codec(
+    {
+        # Reply: "coordinate of axis 1,axis 2,axis 3"[0.01μm]
+        "status": Command(lambda: b"Q:", Reply(3)),
+        # Reply: "0"(ready) or "1"(busy) for each axis
+        "ready": Command(lambda: b"!:", Reply(3)),
+        # Arguments: axis. Reply: "start speed,max speed,acceleration time"[0.01μm/sec, msec]
+        "speed": Command(lambda axis: b"?:D%d" % axis, Reply(3)),
+        # Arguments: mode(b"D" or b"B"), axis, start speed, max speed[0.01μm/sec], acceleration time[msec],
+        # and return-to-origin speed[0.01μm/sec] or None
+        "set_speed": Command(
+            lambda mode, axis, start, max, acc, origin: b"%s:%d,%d,%d,%d" % (mode, axis, start, max, acc)
+            + (b"" if origin is None else b",%d" % origin),
+            configures=2,
+        ),
+        # Arguments: coordinates or displacements of each axis[0.01μm] or None
+        "move_absolute": Command(lambda *values: b"A:" + _optional_integers(values)),
+        "move_relative": Command(lambda *values: b"M:" + _optional_integers(values), idempotent=False),
+        # Arguments: directions(b"+", b"-" or b"") of each axis
+        "jog": Command(lambda *directions: b"J:" + b",".join(directions)),
+        # Arguments: whether to apply to each axis
+        "fix_origin": Command(lambda *axis: b"R:" + _axis_flags(axis), idempotent=False),
+        "home": Command(lambda *axis: b"H:" + _axis_flags(axis)),
+        "stop": Command(lambda *axis: b"L:" + _axis_flags(axis)),
+        "emergency_stop": Command(lambda: b"L:E"),
+    }
+)
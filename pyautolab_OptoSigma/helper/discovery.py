@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from serial import Serial
+from serial.serialutil import EIGHTBITS, PARITY_NONE, STOPBITS_ONE, SerialException
+from serial.tools import list_ports
+
+from pyautolab_OptoSigma.helper.driver import HSC103, SHOT702
+from pyautolab_OptoSigma.helper.storage import load_state, save_state
+from pyautolab_OptoSigma.shot702.driver import Shot702
+
+DISCOVERY_STATE = "ports.json"
+# Result of probing a port which cannot be opened, e.g. because pyAutoLab or a stage server holds it
+_BUSY = "busy"
+
+
+def identify_reply(reply: str) -> str | None:
+    """Identify the controller model by its reply to the status query `Q:`.
+
+    Shot702 replies the coordinates of 2 axes padded between the sign and the
+    digits followed by 3 status flags ("-     1000,         0,K,K,R"). Hsc103
+    replies only the coordinates of 3 axes ("0,0,0").
+
+    Parameters
+    ----------
+    reply : str
+        Reply to `Q:` without delimiter.
+
+    Returns
+    -------
+    str | None
+        Controller model. None when the reply is not from a known controller.
+    """
+    fields = [field.strip() for field in reply.split(",")]
+    is_flags = all(len(flag) == 1 and flag.isalpha() for flag in fields[2:])
+    if len(fields) == 5 and _are_integers(fields[:2]) and is_flags:
+        return SHOT702
+    if len(fields) == 3 and _are_integers(fields):
+        return HSC103
+    return None
+
+
+def _are_integers(fields: list[str]) -> bool:
+    return all(field.lstrip("+-").lstrip(" ").isdigit() for field in fields)
+
+
+def probe_port(port: str, timeout: float = 0.2) -> str | None:
+    """Open a port and identify the controller connected to it.
+
+    Parameters
+    ----------
+    port : str
+        Port name.
+    timeout : float, optional
+        Deadline of each of write and read[sec], by default 0.2.
+
+    Returns
+    -------
+    str | None
+        Controller model. None when no known controller replied in time.
+    """
+    model = _probe(port, timeout)
+    return None if model == _BUSY else model
+
+
+def _probe(port: str, timeout: float) -> str | None:
+    """Like `probe_port`, but return `_BUSY` when the port cannot be opened."""
+    try:
+        ser = Serial(
+            port=port,
+            baudrate=38400,
+            bytesize=EIGHTBITS,
+            stopbits=STOPBITS_ONE,
+            parity=PARITY_NONE,
+            rtscts=True,
+            timeout=timeout,
+            write_timeout=timeout,
+        )
+    except (SerialException, OSError):
+        return _BUSY
+    try:
+        with ser:
+            ser.reset_input_buffer()
+            ser.write(b"Q:\r\n")
+            reply = ser.readline()
+    except (SerialException, OSError):
+        return None
+    if not reply.endswith(b"\r\n"):
+        return None
+    return identify_reply(reply[:-2].decode("ascii", errors="replace"))
+
+
+def discover_controllers(
+    port_filter: str = Shot702.PORT_FILTER, timeout: float = 0.2, use_cache: bool = True
+) -> dict[str, str]:
+    """Find the OptoSigma controllers connected to the host.
+
+    Every candidate port is probed concurrently, so discovery takes about one
+    `timeout` however many adapters are connected. The model identified for a
+    USB-serial adapter is cached by its serial number. A port which cannot be
+    opened, e.g. because pyAutoLab or a stage server holds it, is reported with
+    its cached model, and the entry of an adapter whose probe finds no controller
+    is dropped.
+
+    Parameters
+    ----------
+    port_filter : str, optional
+        Only ports whose description contains this string are candidates. Pass ""
+        to probe every serial port of the host, by default `Shot702.PORT_FILTER`.
+    timeout : float, optional
+        Deadline of each probe[sec], by default 0.2.
+    use_cache : bool, optional
+        Whether to report the cached models of ports which cannot be opened, by default True.
+
+    Returns
+    -------
+    dict[str, str]
+        Controller model for each port name.
+    """
+    cache = load_state(DISCOVERY_STATE)
+    found: dict[str, str] = {}
+    candidates = [info for info in list_ports.comports() if port_filter in info.description]
+    if not candidates:
+        return found
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        models = executor.map(lambda info: _probe(info.device, timeout), candidates)
+        for info, model in zip(candidates, models):
+            key = info.serial_number
+            if model == _BUSY:
+                if use_cache and key in cache:
+                    found[info.device] = cache[key]
+            elif model is not None:
+                found[info.device] = model
+                if key:
+                    cache[key] = model
+            else:
+                cache.pop(key, None)
+    save_state(DISCOVERY_STATE, cache)
+    return found
+
+
+def find_ports(model: str, port_filter: str = Shot702.PORT_FILTER, timeout: float = 0.2) -> list[str]:
+    """Return the ports connected to the controllers of the model.
+
+    Parameters
+    ----------
+    model : str
+        Controller model. `SHOT702` or `HSC103`.
+    port_filter : str, optional
+        Only ports whose description contains this string are candidates. Pass ""
+        to probe every serial port of the host, by default `Shot702.PORT_FILTER`.
+    timeout : float, optional
+        Deadline of each probe[sec], by default 0.2.
+
+    Returns
+    -------
+    list[str]
+        Sorted port names.
+    """
+    return sorted(port for port, found in discover_controllers(port_filter, timeout).items() if found == model)
@@ -1,11 +1,23 @@
+import json
+import time
 from abc import abstractmethod
 from dataclasses import dataclass
+from pathlib import Path
 
 from pyautolab import api
 from serial import Serial
+from serial.serialutil import EIGHTBITS, PARITY_NONE, STOPBITS_ONE, SerialException
 from typing import Final, Literal
 
+from pyautolab_OptoSigma.helper.codec import Codec
+from pyautolab_OptoSigma.helper.profiler import PROFILER, SERIAL
+from pyautolab_OptoSigma.helper.storage import load_state, save_state
+
 PARAMETER = {"Displacement": "μm"}
+ORIGIN_STATE = "origin.json"
+# Name of controller model. Same as the driver class name.
+SHOT702: Final = "Shot702"
+HSC103: Final = "Hsc103"
 
 
 class _StageControllerSerial(Serial):
@@ -23,6 +35,11 @@ class _StageControllerSerial(Serial):
         self.send_message(message)
         return self.receive_message()
 
+    def send_query_bytes(self, message: bytes) -> bytes:
+        """Send an encoded message including the delimiter and return the reply without it."""
+        self.write(message)
+        return self.readline()[: -1 * len(self._delimiter)]
+
 
 @dataclass(frozen=True)
 class Stage:
@@ -31,16 +48,99 @@ class Stage:
     resolution_full: int
     # mm/sec
     max_speed: int
+    # Travel range seen from the mechanical origin[μm]
+    travel_min: int
+    travel_max: int
+    # μm/sec^2
+    max_acceleration: int
+
+
+def load_stages() -> dict[str, Stage]:
+    """Load the stage profiles shipped in `stages.json`.
+
+    Returns
+    -------
+    dict[str, Stage]
+        Stage profile for each stage name.
+    """
+    with (Path(__file__).parent / "stages.json").open(encoding="utf-8") as f:
+        return {name: Stage(name=name, **profile) for name, profile in json.load(f).items()}
 
 
-SGSP26: Final = Stage(name="SGSP26", resolution_full=4, max_speed=30)
-OSMS26: Final = Stage(name="OSMS26", resolution_full=4, max_speed=10)
+STAGES: Final = load_stages()
+SGSP26: Final = STAGES["SGSP26"]
+OSMS26: Final = STAGES["OSMS26"]
 
 
 class StageController(api.Device):
+    # Number of axes driven by the controller
+    AXES = 1
+    # Prefix of the settings of the controller model in configuration.json
+    SETTING_PREFIX = ""
+    # Messages of the controller model. Empty for drivers which do not own the port.
+    CODEC = Codec({})
+    # Time to keep reopening a dropped port[sec]
+    RECONNECT_TIMEOUT = 10.0
+    # Interval between attempts to reopen a dropped port[sec]
+    RECONNECT_INTERVAL = 0.5
+    # Number of times an interrupted idempotent command is sent again
+    RETRIES = 2
+    # Whether `encode_move` and `send_encoded` are implemented
+    CAN_ENCODE = False
+    # Query of `CODEC` reading back each configuration, keyed like `_configuration`. The
+    # replies are compared after a reconnect to detect a controller which was
+    # power-cycled and reverted to its defaults.
+    CONFIGURATION_QUERIES: dict[tuple, tuple] = {}
+
     def __init__(self) -> None:
         super().__init__()
         self._ser = _StageControllerSerial()
+        self.stage: Stage | None = None
+        # Position of the logical origin seen from the mechanical origin of each axis[μm].
+        # None while the mechanical origin of the axis is unknown.
+        self.origin_offsets: list[float | None] = [None] * self.AXES
+        # Whether homing of each axis was started and its mechanical origin is to be recorded
+        self._homing = [False] * self.AXES
+        # Last message of each configuration set through `CODEC`, sent again after a reconnect
+        self._configuration: dict[tuple, bytes] = {}
+        # Reply to each query of `CONFIGURATION_QUERIES` after the last configuration it reads back
+        self._configuration_replies: dict[tuple, bytes] = {}
+        # Reply parsers of this driver. Their buffers are not shared with other drivers.
+        self._parsers = self.CODEC.parsers()
+
+    def open(self) -> None:
+        """Connect the stage controller and restore the persisted mechanical origin."""
+        self._ser.port = self.port
+        self._ser.baudrate = 38400
+        self._ser.bytesize = EIGHTBITS
+        self._ser.stopbits = STOPBITS_ONE
+        self._ser.timeout = 1
+        self._ser.parity = PARITY_NONE
+        self._ser.rtscts = True
+        self._ser.open()
+        self.initialize("OSMS26")
+        self.restore_origin(int(api.get_setting(f"{self.SETTING_PREFIX}.originProbeDistance")))
+
+    def close(self) -> None:
+        """Persist the mechanical origin and disconnect the stage controller."""
+        try:
+            self.save_origin()
+        except SerialException:
+            # The port dropped and could not be reopened. The origins persisted
+            # before stay, and the port is closed anyway.
+            pass
+        finally:
+            self._ser.close()
+
+    def initialize(self, stage: str) -> None:
+        """Select the stage profile used to check the travel range and speed limits.
+
+        Parameters
+        ----------
+        stage : str
+            Stage controlled by controller
+        """
+        self.stage = STAGES[stage]
 
     def receive(self) -> str:
         return self._ser.receive_message()
@@ -52,6 +152,91 @@ class StageController(api.Device):
         self._ser.reset_input_buffer()
         self._ser.reset_output_buffer()
 
+    def _send(self, name: str, *args) -> bytes:
+        """Send a command of `CODEC` and return the reply without delimiter."""
+        command = self.CODEC.commands[name]
+        message = self.CODEC.encode(name, *args)
+        reply = self._exchange((message,), command.idempotent)
+        if command.configures is not None:
+            key = (name, *args[: command.configures])
+            self._configuration[key] = message
+            # Only the configuration just changed is read back
+            if (query := self.CONFIGURATION_QUERIES.get(key)) is not None:
+                self._configuration_replies[query] = self._exchange((self.CODEC.encode(*query),), True)
+        return reply
+
+    def _query(self, name: str, *args) -> list[int]:
+        """Send a command of `CODEC` and return the integers of the reply.
+        The list is reused by the next query of the same command.
+        """
+        return self._parsers[name](self._send(name, *args))
+
+    def _exchange(self, messages: tuple[bytes, ...], retry: bool) -> bytes:
+        """Send encoded messages and return the reply to the last one without delimiter.
+
+        When the port drops, it is reopened with the settings of `open()`, the
+        configuration is restored and the controller state is reconciled. Then all
+        the messages are sent again if `retry`.
+
+        Parameters
+        ----------
+        messages : tuple[bytes, ...]
+            Messages including the delimiter.
+        retry : bool
+            Whether sending the messages again is safe, e.g. absolute moves and queries.
+
+        Raises
+        ------
+        SerialException
+            If the port cannot be reopened, the controller lost its state, the
+            messages must not be sent again or the retries ran out.
+        """
+        attempt = 0
+        while True:
+            try:
+                with PROFILER.span(SERIAL, messages[0]):
+                    for message in messages:
+                        reply = self._ser.send_query_bytes(message)
+                return reply
+            except SerialException as error:
+                if self._ser.port is None:
+                    raise
+                self._reconnect(error)
+                if not retry or self.RETRIES <= attempt:
+                    raise SerialException(f"Sending {b''.join(messages)!r} was interrupted by a reconnect.") from error
+                attempt += 1
+
+    def _reconnect(self, error: SerialException) -> None:
+        """Reopen the dropped port, restore the configuration and reconcile the state."""
+        deadline = time.monotonic() + self.RECONNECT_TIMEOUT
+        while True:
+            try:
+                self._ser.close()
+            except (SerialException, OSError):
+                pass
+            try:
+                self._ser.open()
+                break
+            except (SerialException, OSError) as open_error:
+                if deadline < time.monotonic():
+                    raise SerialException(f"Could not reopen {self._ser.port}: {open_error}") from error
+                time.sleep(self.RECONNECT_INTERVAL)
+        self._ser.reset_input_buffer()
+        self._ser.reset_output_buffer()
+        replies = {
+            query: self._ser.send_query_bytes(self.CODEC.encode(*query)) for query in self._configuration_replies
+        }
+        for message in self._configuration.values():
+            self._ser.send_query_bytes(message)
+        # Check that the controller answers status queries again
+        self._parsers["status"](self._ser.send_query_bytes(self.CODEC.encode("status")))
+        if replies != self._configuration_replies:
+            # A power-cycled controller reverts to its default configuration and loses
+            # its logical and mechanical origins.
+            self.origin_offsets = [None] * self.AXES
+            self._homing = [False] * self.AXES
+            raise SerialException("Controller was reset while disconnected and lost its positions.") from error
+
     @abstractmethod
     def get_speed(self) -> list[list[float]]:
         """Get stages travel speed and acceleration/deceleration time.
@@ -117,6 +302,40 @@ class StageController(api.Device):
         """
         pass
 
+    def encode_move(self, displacements: tuple[int | None, ...], mode: Literal["A", "M"] = "A") -> tuple[bytes, ...]:
+        """Build the commands of `move_stages` without sending them, so that they can
+        be prepared while the stages are moving. Only drivers whose `CAN_ENCODE` is True
+        implement it, the others raise `NotImplementedError`.
+
+        Parameters
+        ----------
+        displacements : tuple[int, ...]
+            Displacements of stages. The number of elements must always be maximum
+            number of stages.
+        mode : str, optional
+            Mode of stage drive. When "A", move absolute. When "M", move relative.
+            , by default "A".
+
+        Returns
+        -------
+        tuple[bytes, ...]
+            Commands to pass to `send_encoded`.
+        """
+        raise NotImplementedError
+
+    def send_encoded(self, commands: tuple[bytes, ...], retry: bool = False) -> None:
+        """Send commands built by `encode_move`.
+
+        Parameters
+        ----------
+        commands : tuple[bytes, ...]
+            Commands built by `encode_move`.
+        retry : bool, optional
+            Whether to send the commands again after a reconnect. Only safe for
+            absolute moves, by default False.
+        """
+        self._exchange(commands, retry)
+
     @abstractmethod
     def is_ready(self) -> list[bool]:
         """Check whether the controller is ready for operation or not.
@@ -186,3 +405,170 @@ class StageController(api.Device):
 
     def measure(self) -> dict[str, float]:
         return {list(PARAMETER)[0]: self.measure_positions()[0]}
+
+    def is_homed(self, axis: int) -> bool:
+        """Check whether the mechanical origin of the axis is known.
+
+        Parameters
+        ----------
+        axis : int
+            Number of stage. Starts from 1.
+        """
+        return self.origin_offsets[axis - 1] is not None
+
+    def ensure_mechanical_origin(self, axis: tuple[bool, ...]) -> bool:
+        """Move the stages to the mechanical origin only when it is unknown.
+
+        Parameters
+        ----------
+        axis : tuple[bool, ...]
+            List showing which axis needs a known mechanical origin.
+
+        Returns
+        -------
+        bool
+            True when homing was started.
+        """
+        unknown = tuple(bool(selected) and not self.is_homed(i + 1) for i, selected in enumerate(axis))
+        if not any(unknown):
+            return False
+        self.move_stage_to_mechanical_origin(unknown + (False,) * (self.AXES - len(unknown)))
+        return True
+
+    def save_origin(self) -> None:
+        """Persist the relationship between the mechanical and the logical origin and the
+        current positions, so that the next session can skip homing.
+        """
+        if not self._ser.is_open or not any(offset is not None for offset in self.origin_offsets):
+            return
+        state = load_state(ORIGIN_STATE)
+        state[self._origin_key] = {"offsets": self.origin_offsets, "positions": self.measure_positions()}
+        save_state(ORIGIN_STATE, state)
+
+    def restore_origin(self, probe_distance: int = 0, timeout: float = 10.0) -> bool:
+        """Restore the persisted mechanical origin when the controller still agrees with it.
+
+        The controller keeps counting while the software restarts, so positions equal to
+        the persisted ones mean that the persisted offsets are still valid. A power-cycled
+        controller reports zero, so an axis persisted at the logical origin with a nonzero
+        offset cannot be trusted and is left unhomed.
+
+        Parameters
+        ----------
+        probe_distance : int, optional
+            When positive, each restored axis is moved out and back by this distance[μm]
+            and must report the commanded displacement, by default 0.
+        timeout : float, optional
+            Time to wait for a probe move[sec], by default 10.0.
+
+        Returns
+        -------
+        bool
+            True when all axes were restored.
+        """
+        self.origin_offsets = [None] * self.AXES
+        record = load_state(ORIGIN_STATE).get(self._origin_key)
+        if not record or len(record.get("offsets", ())) != self.AXES:
+            return False
+        positions = self.measure_positions()
+        tolerance = self.position_tolerance()
+        for i, (offset, saved, current) in enumerate(zip(record["offsets"], record["positions"], positions)):
+            if offset is None or abs(saved - current) > tolerance or (current == 0 and offset != 0):
+                continue
+            if probe_distance > 0 and not self._probe_axis(i + 1, probe_distance, timeout):
+                continue
+            self.origin_offsets[i] = offset
+        return all(offset is not None for offset in self.origin_offsets)
+
+    def _probe_axis(self, axis: int, distance: int, timeout: float) -> bool:
+        """Move an axis out and back and check that it reports the commanded displacement.
+
+        Parameters
+        ----------
+        axis : int
+            Number of stage. Starts from 1.
+        distance : int
+            Probe distance[μm].
+        timeout : float
+            Time to wait for each move[sec].
+
+        Returns
+        -------
+        bool
+            True when the axis moved freely.
+        """
+        start = self.measure_positions()[axis - 1]
+        for displacement, expected in ((distance, start + distance), (-distance, start)):
+            displacements: list[int | None] = [None] * self.AXES
+            displacements[axis - 1] = displacement
+            self.move_stages(tuple(displacements), "M")
+            if not self._wait_ready(timeout):
+                self.stop(tuple(i == axis - 1 for i in range(self.AXES)))
+                return False
+            if abs(self.measure_positions()[axis - 1] - expected) > self.position_tolerance():
+                return False
+        return True
+
+    def _wait_ready(self, timeout: float, interval: float = 0.01) -> bool:
+        """Wait until all stages are ready.
+
+        Parameters
+        ----------
+        timeout : float
+            [sec]
+        interval : float, optional
+            Polling interval[sec], by default 0.01.
+
+        Returns
+        -------
+        bool
+            False when timed out.
+        """
+        deadline = time.monotonic() + timeout
+        while not all(self.is_ready()):
+            if deadline < time.monotonic():
+                return False
+            time.sleep(interval)
+        return True
+
+    def _shift_origin(self, axis: tuple[bool, ...]) -> None:
+        """Follow the logical origin moving to the current position of each axis.
+        Must be called before the controller applies the new origin.
+        """
+        if not any(offset is not None for offset in self.origin_offsets):
+            return
+        positions = self.measure_positions()
+        for i, selected in enumerate(axis[: self.AXES]):
+            offset = self.origin_offsets[i]
+            if selected and offset is not None:
+                self.origin_offsets[i] = round(offset + positions[i], 2)
+
+    def _start_homing(self, axis: tuple[bool, ...]) -> None:
+        """Forget the mechanical origin of each axis whose homing was just started.
+        `_finish_homing` records it once the homing finished.
+        """
+        for i, selected in enumerate(axis[: self.AXES]):
+            if selected:
+                self.origin_offsets[i] = None
+                self._homing[i] = True
+
+    def _finish_homing(self, ready: list[bool]) -> None:
+        """Record the mechanical origin, which becomes the logical origin, of the homing
+        axes once the stages are ready. Called by `is_ready`. An axis which stopped
+        away from the origin, e.g. by `stop`, stays unhomed.
+        """
+        if not any(self._homing) or not all(ready):
+            return
+        positions = self.measure_positions()
+        for i, homing in enumerate(self._homing):
+            if homing and abs(positions[i]) <= self.position_tolerance():
+                self.origin_offsets[i] = 0.0
+        self._homing = [False] * self.AXES
+
+    def position_tolerance(self) -> float:
+        """Return the smallest position difference[μm] the controller can report."""
+        return 0.01
+
+    @property
+    def _origin_key(self) -> str:
+        return f"{type(self).__name__}:{self.port}"
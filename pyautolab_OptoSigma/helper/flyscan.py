@@ -0,0 +1,151 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from pyautolab_OptoSigma.helper.driver import StageController
+
+
+@dataclass(frozen=True)
+class FlyScanResult:
+    # Host time (same clock as `time.time`) at the middle of each position query[sec]
+    timestamps: np.ndarray
+    # μm
+    positions: np.ndarray
+
+    def velocities(self) -> np.ndarray:
+        """Return the velocity at each sample[μm/sec]."""
+        if len(self.positions) < 2:
+            return np.zeros_like(self.positions)
+        return np.gradient(self.positions, self.timestamps)
+
+    def position_at(self, timestamps: np.ndarray) -> np.ndarray:
+        """Interpolate positions at other timestamps, e.g. of other pyAutoLab measurements.
+
+        Parameters
+        ----------
+        timestamps : np.ndarray
+            Host time[sec].
+
+        Returns
+        -------
+        np.ndarray
+            Positions[μm]. Outside the scan, the first or the last position.
+        """
+        return np.interp(timestamps, self.timestamps, self.positions)
+
+    def trim_ramps(self, tolerance: float = 0.05) -> "FlyScanResult":
+        """Remove the acceleration and deceleration ramps.
+
+        Parameters
+        ----------
+        tolerance : float, optional
+            Allowed relative deviation from the cruise velocity, by default 0.05.
+
+        Returns
+        -------
+        FlyScanResult
+            Samples from the first to the last one moving at the cruise velocity.
+        """
+        velocities = np.abs(self.velocities())
+        moving = velocities[velocities > 0]
+        if len(moving) == 0:
+            return self
+        cruise = np.median(moving)
+        (at_cruise,) = np.nonzero(np.abs(velocities - cruise) <= tolerance * cruise)
+        if len(at_cruise) == 0:
+            return self
+        span = slice(at_cruise[0], at_cruise[-1] + 1)
+        return FlyScanResult(self.timestamps[span], self.positions[span])
+
+
+def fly_scan(
+    device: StageController,
+    axis: int,
+    distance: int,
+    speed: int,
+    acceleration_time: int,
+    start_speed: int = 500,
+    use_jog: bool = False,
+    sample_interval: float = 0.0,
+    timeout: float = 600.0,
+) -> FlyScanResult:
+    """Drive an axis at a constant speed and capture its position on the fly.
+
+    Parameters
+    ----------
+    device : StageController
+        Opened driver.
+    axis : int
+        Number of stage to scan. Starts from 1.
+    distance : int
+        Relative scan distance[μm]. The sign decides the direction.
+    speed : int
+        Cruise speed[μm/sec].
+    acceleration_time : int
+        [msec]
+    start_speed : int, optional
+        Start-up speed of the long move[μm/sec], by default 500.
+    use_jog : bool, optional
+        When True, jog at `speed` as the minimum speed and stop after `distance`.
+        When False, one long move with `speed` as the maximum speed, by default False.
+    sample_interval : float, optional
+        Minimum interval between samples[sec]. 0 samples as fast as the line allows,
+        by default 0.0.
+    timeout : float, optional
+        [sec], by default 600.0.
+
+    Returns
+    -------
+    FlyScanResult
+        Position versus time including the ramps. Use `trim_ramps` for the constant
+        speed part. The scan also ends when the stage stops short of the target, and
+        the speed setting of the axis is restored afterwards.
+    """
+    index = axis - 1
+    start = device.measure_positions()[index]
+    target = start + distance
+    speed_before = device.get_speed()[index]
+    deadline = time.perf_counter() + timeout
+    try:
+        if use_jog:
+            device.set_stage_speed(axis, speed, speed, acceleration_time, None)
+            directions: list[str | None] = [None] * device.AXES
+            directions[index] = "+" if 0 <= distance else "-"
+            device.jog(tuple(directions))  # type: ignore
+        else:
+            device.set_stage_speed(axis, min(start_speed, speed), speed, acceleration_time, None)
+            displacements: list[int | None] = [None] * device.AXES
+            displacements[index] = distance
+            device.move_stages(tuple(displacements), "M")
+
+        # Host wall clock with the resolution of the performance counter
+        wall_offset = time.time() - time.perf_counter()
+        timestamps: list[float] = []
+        positions: list[float] = []
+        tolerance = device.position_tolerance()
+        while True:
+            sent_at = time.perf_counter()
+            position = device.measure_positions()[index]
+            received_at = time.perf_counter()
+            timestamps.append(wall_offset + (sent_at + received_at) / 2)
+            positions.append(position)
+            if abs(position - target) <= tolerance or (use_jog and 0 <= (position - target) * np.sign(distance)):
+                break
+            # A stage which stopped short of the target, e.g. at a limit, is ready. Only
+            # query when the position did not change, to keep the sample rate.
+            if 1 < len(positions) and positions[-2] == position and all(device.is_ready()):
+                break
+            if deadline < received_at:
+                device.emergency_stop()
+                raise TimeoutError(f"Fly scan of {distance}μm did not finish in {timeout} sec.")
+            if sample_interval:
+                time.sleep(max(0.0, sample_interval - (time.perf_counter() - sent_at)))
+        if use_jog:
+            device.stop(tuple(i == index for i in range(device.AXES)))
+    finally:
+        # The controller rejects speed settings while the stage decelerates
+        while not all(device.is_ready()) and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        device.set_stage_speed(axis, round(speed_before[0]), round(speed_before[1]), int(speed_before[2]), None)
+    return FlyScanResult(np.array(timestamps), np.array(positions))
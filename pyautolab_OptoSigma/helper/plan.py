@@ -0,0 +1,198 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator, Literal
+
+import numpy as np
+
+from pyautolab_OptoSigma.helper.driver import StageController
+from pyautolab_OptoSigma.helper.profiler import DWELL, GUI, IDLE, MOTION_WAIT, PROFILER
+
+
+class ScanPlan:
+    """Target list stored in a `.npy` or CSV file, read chunk by chunk.
+
+    Each row holds the targets[μm] of the axes from the first one. NaN, or an empty
+    CSV field, leaves the axis where it is. Blank lines of CSV files are not rows.
+    `.npy` files are memory-mapped, and CSV files are read line by line, so the whole
+    plan is never loaded into memory.
+
+    Parameters
+    ----------
+    path : str | Path
+        Plan file.
+    header : bool, optional
+        Whether the first line of a CSV file is a header, by default False.
+    """
+
+    def __init__(self, path: str | Path, header: bool = False) -> None:
+        self.path = Path(path)
+        self._header = header
+        if self.path.suffix == ".npy":
+            self._array: np.ndarray | None = np.load(self.path, mmap_mode="r")
+            self.rows = len(self._array)
+        else:
+            self._array = None
+            self.rows = sum(1 for _ in self._csv_rows())
+
+    def iter_chunks(self, start_row: int = 0, chunk_size: int = 1024) -> Iterator[tuple[int, np.ndarray]]:
+        """Yield chunks of rows as 2-dimensional float arrays.
+
+        Parameters
+        ----------
+        start_row : int, optional
+            Index of the first row, by default 0.
+        chunk_size : int, optional
+            Number of rows of each chunk, by default 1024.
+
+        Yields
+        ------
+        tuple[int, np.ndarray]
+            Index of the first row of the chunk and the chunk.
+        """
+        if self._array is not None:
+            for first in range(start_row, self.rows, chunk_size):
+                chunk = np.asarray(self._array[first : first + chunk_size], dtype=np.float64)
+                yield first, chunk.reshape(len(chunk), -1)
+            return
+        lines = islice(self._csv_rows(), start_row, None)
+        first = start_row
+        while chunk_lines := list(islice(lines, chunk_size)):
+            # Every line is one row, also when it has a single field or starts with "#"
+            chunk = np.genfromtxt(chunk_lines, delimiter=",", dtype=np.float64, comments=None, ndmin=2)
+            yield first, chunk
+            first += len(chunk)
+
+    def _csv_rows(self) -> Iterator[str]:
+        """Yield the lines of the CSV file holding rows, i.e. without the header and blank lines."""
+        with self.path.open(encoding="utf-8") as f:
+            lines = islice(f, int(self._header), None)
+            yield from (line for line in lines if line.strip())
+
+
+class PlanRunner:
+    """Execute a scan plan by streaming its chunks through `move_stages`.
+
+    While the stages move, the next chunk is read and its commands are encoded in a
+    background thread. `row` is the index of the next row to execute, so a stopped
+    or failed run resumes by passing it as `start_row`.
+
+    Parameters
+    ----------
+    device : StageController
+        Opened driver.
+    plan : ScanPlan
+        Plan to execute.
+    mode : str, optional
+        When "A", rows are absolute positions. When "M", relative displacements,
+        by default "A".
+    start_row : int, optional
+        Index of the first row to execute, by default 0.
+    chunk_size : int, optional
+        Number of rows read and encoded at once, by default 1024.
+    dwell_time : float, optional
+        Time to stay at each target[sec], by default 0.0.
+    poll_interval : float, optional
+        Interval of the ready queries[sec], by default 0.005.
+    progress : Callable[[int, int], None] | None, optional
+        Called with the number of executed rows and the total rows after each row.
+    timeout : float, optional
+        Time to wait for each move[sec]. The stages are stopped and `TimeoutError`
+        is raised when it runs out, by default 600.0.
+    """
+
+    def __init__(
+        self,
+        device: StageController,
+        plan: ScanPlan,
+        mode: Literal["A", "M"] = "A",
+        start_row: int = 0,
+        chunk_size: int = 1024,
+        dwell_time: float = 0.0,
+        poll_interval: float = 0.005,
+        progress: Callable[[int, int], None] | None = None,
+        timeout: float = 600.0,
+    ) -> None:
+        self._device = device
+        self._plan = plan
+        self._mode = mode
+        self._chunk_size = chunk_size
+        self._dwell_time = dwell_time
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+        self._progress = progress
+        self._stop_requested = False
+        self.row = start_row
+        self._can_encode = device.CAN_ENCODE
+
+    def run(self) -> int:
+        """Execute the plan from `row` until the end or `stop`.
+
+        Returns
+        -------
+        int
+            Index of the next row to execute.
+        """
+        self._stop_requested = False
+        PROFILER.begin("plan")
+        chunks = self._plan.iter_chunks(self.row, self._chunk_size)
+        try:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                prepared = executor.submit(self._prepare, chunks)
+                while (moves := prepared.result()) is not None:
+                    prepared = executor.submit(self._prepare, chunks)
+                    for move in moves:
+                        if self._stop_requested:
+                            return self.row
+                        PROFILER.operation(self.row)
+                        self._execute(move)
+                        self.row += 1
+                        if self._progress is not None:
+                            with PROFILER.span(GUI, "progress"):
+                                self._progress(self.row, self._plan.rows)
+            return self.row
+        finally:
+            PROFILER.end()
+
+    def stop(self) -> None:
+        """Stop after the current row. Call from another thread or the progress callback."""
+        self._stop_requested = True
+
+    def _prepare(self, chunks: Iterator[tuple[int, np.ndarray]]) -> list | None:
+        """Read the next chunk and convert its rows to encoded commands or displacements."""
+        chunk = next(chunks, None)
+        if chunk is None:
+            return None
+        _, targets = chunk
+        axes = self._device.AXES
+        moves = []
+        for target in targets[:, :axes].tolist():
+            displacements = tuple(None if math.isnan(value) else round(value) for value in target)
+            displacements += (None,) * (axes - len(displacements))
+            if all(displacement is None for displacement in displacements):
+                # Nothing to move. Only dwell.
+                moves.append(None)
+            elif self._can_encode:
+                moves.append(self._device.encode_move(displacements, self._mode))
+            else:
+                moves.append(displacements)
+        return moves
+
+    def _execute(self, move: tuple | None) -> None:
+        if move is not None and self._can_encode:
+            self._device.send_encoded(move, retry=self._mode == "A")
+        elif move is not None:
+            self._device.move_stages(move, self._mode)
+        PROFILER.set_state(MOTION_WAIT)
+        deadline = time.perf_counter() + self._timeout
+        while not all(self._device.is_ready()):
+            if deadline < time.perf_counter():
+                self._device.emergency_stop()
+                raise TimeoutError(f"Move of row {self.row} did not finish in {self._timeout} sec.")
+            time.sleep(self._poll_interval)
+        PROFILER.set_state(IDLE)
+        if self._dwell_time:
+            with PROFILER.span(DWELL):
+                time.sleep(self._dwell_time)
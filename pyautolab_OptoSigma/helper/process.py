@@ -0,0 +1,293 @@
+import multiprocessing as mp
+import time
+from importlib import import_module
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Literal
+
+import numpy as np
+from serial.serialutil import SerialException
+
+from pyautolab_OptoSigma.helper.driver import StageController
+
+# Layout of the status block: [sequence, timestamp, number of ready states, number of failed polls,
+# positions..., ready...] as float64. The sequence is odd while the child writes the block.
+_SEQ, _TIME, _READY_COUNT, _ERROR_COUNT, _HEADER_SIZE = 0, 1, 2, 3, 4
+_MOTION_COMMANDS = frozenset(
+    (
+        "set_stage_speed",
+        "move_stages",
+        "fix_origin",
+        "move_stage_to_mechanical_origin",
+        "stop",
+        "emergency_stop",
+        "jog",
+    )
+)
+
+
+def _load_class(path: str) -> type[StageController]:
+    """Load a driver class from a path like `pyautolab_OptoSigma.shot702.driver:Shot702`."""
+    module, _, name = path.partition(":")
+    return getattr(import_module(module), name)
+
+
+def _publish(device: StageController, status: np.ndarray) -> None:
+    axes = device.AXES
+    positions = device.measure_positions()
+    ready = device.is_ready()
+    status[_SEQ] += 1
+    status[_TIME] = time.time()
+    status[_READY_COUNT] = len(ready)
+    status[_HEADER_SIZE : _HEADER_SIZE + axes] = positions
+    status[_HEADER_SIZE + axes : _HEADER_SIZE + axes + len(ready)] = ready
+    status[_SEQ] += 1
+
+
+def _report_error(status: np.ndarray) -> None:
+    status[_SEQ] += 1
+    status[_ERROR_COUNT] += 1
+    status[_SEQ] += 1
+
+
+def _device_state(device: StageController) -> dict[str, Any]:
+    """State of the driver mirrored by the proxy."""
+    return {"stage": device.stage, "origin_offsets": list(device.origin_offsets)}
+
+
+def _host(class_path: str, port: str, conn: Connection, shm_name: str, poll_interval: float) -> None:
+    """Entry point of the driver process."""
+    shm = SharedMemory(shm_name)
+    status = np.ndarray((shm.size // 8,), dtype=np.float64, buffer=shm.buf)
+    try:
+        _serve(_load_class(class_path), port, conn, status, poll_interval)
+    finally:
+        del status
+        shm.close()
+
+
+def _serve(
+    device_class: type[StageController], port: str, conn: Connection, status: np.ndarray, interval: float
+) -> None:
+    device = device_class()
+    device.port = port
+    try:
+        device.open()
+        _publish(device, status)
+    except Exception as error:
+        conn.send(("error", f"{type(error).__name__}: {error}", _device_state(device)))
+        return
+    conn.send(("ok", None, _device_state(device)))
+    while True:
+        if not conn.poll(interval):
+            try:
+                _publish(device, status)
+            except Exception:
+                # A garbled reply or a dropped port must not end the process. The
+                # proxy sees the count, and the next poll tries again.
+                _report_error(status)
+            continue
+        name, args = conn.recv()
+        if name == "close":
+            try:
+                device.close()
+            finally:
+                conn.send(("ok", None, _device_state(device)))
+            return
+        try:
+            result = getattr(device, name)(*args)
+            if name in _MOTION_COMMANDS:
+                _publish(device, status)
+        except Exception as error:
+            conn.send(("error", f"{type(error).__name__}: {error}", _device_state(device)))
+            continue
+        conn.send(("ok", result, _device_state(device)))
+
+
+class ProcessStageController(StageController):
+    """Driver running in a dedicated child process.
+
+    Commands are sent through a pipe, and the child publishes the latest positions
+    and ready states into a shared memory block, which `measure_positions` and
+    `is_ready` read without any inter-process round trip. The stage profile and
+    the origin offsets of the driver in the child are mirrored after every call.
+    A crash of the child surfaces as `SerialException` instead of ending the
+    calling process, and the next call starts a new child.
+
+    Parameters
+    ----------
+    class_path : str
+        Driver class, e.g. `pyautolab_OptoSigma.shot702.driver:Shot702`.
+    poll_interval : float, optional
+        Interval at which the child publishes the status[sec], by default 0.02.
+    timeout : float, optional
+        Time to wait for the child to reply[sec], by default 30.0.
+    """
+
+    def __init__(self, class_path: str, poll_interval: float = 0.02, timeout: float = 30.0) -> None:
+        super().__init__()
+        self._class_path = class_path
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+        self.AXES = _load_class(class_path).AXES
+        self.origin_offsets = [None] * self.AXES
+        self._shm: SharedMemory | None = None
+        self._conn: Connection | None = None
+        self._process: mp.Process | None = None
+        self.status = np.zeros(0)
+        # Whether the child should be running, i.e. between `open` and `close`
+        self._opened = False
+        # Number of children started again after a crash
+        self.restarts = 0
+
+    def open(self) -> None:
+        """Start the driver process and connect the controller in it."""
+        self._shm = SharedMemory(create=True, size=8 * (_HEADER_SIZE + 2 * self.AXES))
+        self.status = np.ndarray((_HEADER_SIZE + 2 * self.AXES,), dtype=np.float64, buffer=self._shm.buf)
+        self.status[:] = 0
+        self._conn, child_conn = mp.Pipe()
+        self._process = mp.get_context("spawn").Process(
+            target=_host,
+            args=(self._class_path, self.port, child_conn, self._shm.name, self._poll_interval),
+            daemon=True,
+        )
+        self._process.start()
+        try:
+            self._receive()
+        except SerialException:
+            self.close()
+            raise
+        self._opened = True
+
+    def close(self) -> None:
+        """Disconnect the controller and stop the driver process."""
+        self._opened = False
+        self._stop_process()
+
+    def _stop_process(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            try:
+                self._call("close")
+            except SerialException:
+                pass
+            self._process.join(self._timeout)
+            if self._process.is_alive():
+                self._process.kill()
+        self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._shm is not None:
+            self.status = np.zeros(0)
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    @property
+    def is_alive(self) -> bool:
+        return self._conn is not None and self._process is not None and self._process.is_alive()
+
+    @property
+    def poll_errors(self) -> int:
+        """Number of status polls of the child which failed, e.g. on a garbled reply."""
+        return int(self.status[_ERROR_COUNT]) if len(self.status) else 0
+
+    def get_speed(self) -> list[list[float]]:
+        return self._call("get_speed")
+
+    def set_stage_speed(
+        self,
+        axis: Literal[1, 2],
+        min: int,
+        max: int,
+        acceleration_time: int,
+        original_reset_speed: int | None,
+        mode: str = "D",
+    ) -> None:
+        self._call("set_stage_speed", axis, min, max, acceleration_time, original_reset_speed, mode)
+
+    def measure_positions(self) -> list[float]:
+        return self._read_status()[_HEADER_SIZE : _HEADER_SIZE + self.AXES].tolist()
+
+    def move_stages(self, displacements: tuple[int | None, ...], mode: Literal["A", "M"] = "A") -> None:
+        self._call("move_stages", displacements, mode)
+
+    def is_ready(self) -> list[bool]:
+        status = self._read_status()
+        ready = status[_HEADER_SIZE + self.AXES : _HEADER_SIZE + self.AXES + int(status[_READY_COUNT])]
+        return [bool(value) for value in ready]
+
+    def is_homed(self, axis: int) -> bool:
+        # The child records the mechanical origin once homing finished, after the last call
+        return super().is_homed(axis) or self._call("is_homed", axis)
+
+    def fix_origin(self, axis: tuple[bool, ...]) -> None:
+        self._call("fix_origin", axis)
+
+    def move_stage_to_mechanical_origin(self, axis: tuple[bool, ...]) -> None:
+        self._call("move_stage_to_mechanical_origin", axis)
+
+    def stop(self, axis: tuple[bool, ...]) -> None:
+        self._call("stop", axis)
+
+    def emergency_stop(self) -> None:
+        self._call("emergency_stop")
+
+    def jog(self, directions: tuple[Literal["+", "-"] | None, ...]) -> None:
+        self._call("jog", directions)
+
+    def _call(self, name: str, *args: Any) -> Any:
+        self._ensure_process()
+        if self._conn is None or not self.is_alive:
+            raise SerialException("Driver process is not running.")
+        try:
+            self._conn.send((name, args))
+        except OSError as error:
+            self._lose_process()
+            raise SerialException("Driver process exited.") from error
+        return self._receive()
+
+    def _receive(self) -> Any:
+        assert self._conn is not None
+        deadline = time.monotonic() + self._timeout
+        while not self._conn.poll(0.1):
+            if not self.is_alive:
+                self._lose_process()
+                raise SerialException("Driver process exited.")
+            if deadline < time.monotonic():
+                raise SerialException("Driver process did not reply.")
+        try:
+            state, result, device_state = self._conn.recv()
+        except EOFError as error:
+            self._lose_process()
+            raise SerialException("Driver process exited.") from error
+        self.stage = device_state["stage"]
+        self.origin_offsets = device_state["origin_offsets"]
+        if state == "error":
+            raise SerialException(result)
+        return result
+
+    def _ensure_process(self) -> None:
+        """Start a new child when the previous one died while opened."""
+        if self._opened and not self.is_alive:
+            self._opened = False
+            self._stop_process()
+            self.restarts += 1
+            self.open()
+
+    def _lose_process(self) -> None:
+        """Forget the pipe to a driver process which exited unexpectedly."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _read_status(self) -> np.ndarray:
+        """Copy a consistent snapshot of the status block."""
+        self._ensure_process()
+        if not self.is_alive:
+            raise SerialException("Driver process exited.")
+        while True:
+            seq = self.status[_SEQ]
+            snapshot = self.status.copy()
+            if seq % 2 == 0 and seq == self.status[_SEQ]:
+                return snapshot
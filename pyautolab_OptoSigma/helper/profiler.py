@@ -0,0 +1,269 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+SERIAL = "serial"
+MOTION_WAIT = "motion wait"
+DWELL = "dwell"
+GUI = "gui"
+IDLE = "idle"
+CATEGORIES = (SERIAL, MOTION_WAIT, DWELL, GUI, IDLE)
+
+_NULL = nullcontext()
+# Tracks of the timeline
+_SPAN_TID, _STATE_TID, _OPERATION_TID = 1, 2, 3
+
+
+class _Span:
+    def __init__(self, profiler: "RunProfiler", category: str, name: str | bytes) -> None:
+        self._profiler = profiler
+        self.category = category
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "_Span":
+        self.start = self._profiler._switch()
+        self._profiler._stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        stack = self._profiler._stack
+        # The profiler was disabled or restarted inside the span
+        if not stack or stack[-1] is not self:
+            return
+        end = self._profiler._switch()
+        stack.pop()
+        self._profiler._event(self.category, self.name, self.start, end, _SPAN_TID)
+
+
+class _TimerSlot(_Span):
+    """`GUI` span of a slot of a repeating timer which also records the lateness of the slot."""
+
+    def __init__(self, profiler: "RunProfiler", name: str) -> None:
+        super().__init__(profiler, GUI, name)
+
+    def __enter__(self) -> "_Span":
+        profiler = self._profiler
+        category = profiler._stack[-1].category if profiler._stack else profiler._state
+        mark = profiler._mark
+        self.start = profiler._switch()
+        timer = profiler._timers.get(self.name)
+        if timer is not None:
+            interval, due, exited = timer
+            # The tick was due at `due`, or as soon as the previous slot returned when it
+            # ran past that. Until the entry, the event loop was busy with other GUI work.
+            late_since = max(due, exited, mark)
+            if late_since < self.start:
+                profiler.totals[category] -= self.start - late_since
+                profiler.totals[GUI] += self.start - late_since
+                profiler._event(GUI, f"{self.name} lateness", late_since, self.start, _SPAN_TID)
+            # Same as Qt, the next tick is due one interval later, or one interval after
+            # this entry when the timer fell behind.
+            due += interval
+            timer[1] = due if self.start <= due else self.start + interval
+        profiler._stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        super().__exit__(*exc_info)
+        timer = self._profiler._timers.get(self.name)
+        if timer is not None:
+            timer[2] = self._profiler._mark
+
+
+class RunProfiler:
+    """Attribute the wall-clock time of a run to categories and record a timeline.
+
+    Time inside a span is attributed to the category of the innermost span, e.g.
+    `SERIAL` for a serial exchange inside a `GUI` timer slot. Outside spans, it is
+    attributed to the state of the run, `MOTION_WAIT` while a move is pending and
+    `IDLE` between operations, except the lateness of timer slots behind their tick,
+    which is spent on other GUI work. Only the thread which called `begin` is recorded,
+    and only until `end`, so that work between runs, e.g. polls of the stage control
+    manager, does not pile up.
+    While disabled, `span` returns a shared no-op context and the other methods
+    only keep track of the state of the run.
+
+    Parameters
+    ----------
+    clock : Callable[[], float], optional
+        Clock[sec], by default `time.perf_counter`.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.enabled = False
+        # Whether a run is between `begin` and `end`
+        self._running = False
+        self.name = ""
+        self._clock = clock
+        self._thread = threading.get_ident()
+        self._origin = clock()
+        self._mark = self._origin
+        self._state = IDLE
+        self._state_start = self._origin
+        self._operation: tuple[int, float] | None = None
+        self._stack: list[_Span] = []
+        # Interval, due time of the next tick and exit of the last slot[sec] of each timer
+        self._timers: dict[str, list[float]] = {}
+        self.totals = dict.fromkeys(CATEGORIES, 0.0)
+        self.events: list[dict] = []
+
+    def enable(self) -> None:
+        """Start recording. Can be called in the middle of a run."""
+        if not self.enabled:
+            self._mark = self._state_start = self._clock()
+            self.enabled = True
+
+    def disable(self) -> None:
+        """Stop recording. Spans still open are dropped."""
+        if self.enabled:
+            if self._running:
+                self._close_state()
+            self._stack.clear()
+            self.enabled = False
+
+    def begin(self, name: str) -> None:
+        """Forget the previous run and start the timeline of a new one from the calling thread."""
+        self.name = name
+        self._running = True
+        self._thread = threading.get_ident()
+        self._origin = self._mark = self._state_start = self._clock()
+        self._state = IDLE
+        self._operation = None
+        self._stack.clear()
+        self._timers.clear()
+        self.totals = dict.fromkeys(CATEGORIES, 0.0)
+        self.events = []
+
+    def end(self) -> None:
+        """Close the open spans, state and operation of the run and stop recording until the next `begin`."""
+        if self._recording():
+            while self._stack:
+                self._stack[-1].__exit__(None, None, None)
+            self._close_state()
+            if self._operation is not None:
+                index, start = self._operation
+                self._event("operation", f"operation {index}", start, self._mark, _OPERATION_TID)
+                self._operation = None
+        self._running = False
+
+    def span(self, category: str, name: str | bytes = "") -> _Span | nullcontext:
+        """Return a context manager attributing the time inside it to `category`."""
+        if not self._recording():
+            return _NULL
+        return _Span(self, category, name)
+
+    def start_timer(self, name: str, interval: float) -> None:
+        """Mark the start of a repeating timer whose slots are wrapped in `timer_slot`.
+
+        Parameters
+        ----------
+        name : str
+            Name of the timer.
+        interval : float
+            Interval of the timer[sec].
+        """
+        if self._recording():
+            now = self._clock()
+            self._timers[name] = [interval, now + interval, now]
+
+    def timer_slot(self, name: str) -> _Span | nullcontext:
+        """Return a context manager attributing the slot of a timer started by `start_timer` to `GUI`.
+
+        The delay between the due tick and the entry of the slot is attributed to `GUI`
+        as well, because the event loop was busy with other work.
+        """
+        if not self._recording():
+            return _NULL
+        return _TimerSlot(self, name)
+
+    def set_state(self, state: str) -> None:
+        """Attribute the time outside spans to `state` from now on, e.g. `MOTION_WAIT` after a move."""
+        if state == self._state:
+            return
+        if self._recording():
+            self._close_state()
+        self._state = state
+
+    def operation(self, index: int) -> None:
+        """Mark the start of an operation, which ends at the start of the next one."""
+        if not self._recording():
+            return
+        now = self._switch()
+        if self._operation is not None:
+            previous, start = self._operation
+            self._event("operation", f"operation {previous}", start, now, _OPERATION_TID)
+        self._operation = (index, now)
+
+    def breakdown(self) -> dict[str, float]:
+        """Return the time attributed to each category[sec]."""
+        return dict(self.totals)
+
+    def save_trace(self, directory: Path) -> Path:
+        """Save the timeline in the Chrome trace event format, readable by Perfetto.
+
+        Parameters
+        ----------
+        directory : Path
+            Directory to save in. The file is named `<name>-trace-<date>.json`.
+
+        Returns
+        -------
+        Path
+            Saved file.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.name or 'run'}-trace-{datetime.now():%Y%m%d-%H%M%S}.json"
+        pid = os.getpid()
+        metadata = [
+            {"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in ((_SPAN_TID, "calls"), (_STATE_TID, "state"), (_OPERATION_TID, "operations"))
+        ]
+        events = [dict(event, pid=pid) for event in self.events]
+        trace = {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"run": self.name, "breakdown": self.breakdown()},
+        }
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(trace, f)
+        return path
+
+    def _recording(self) -> bool:
+        return self.enabled and self._running and threading.get_ident() == self._thread
+
+    def _switch(self) -> float:
+        """Attribute the time since the last switch to the current category and return now."""
+        now = self._clock()
+        category = self._stack[-1].category if self._stack else self._state
+        self.totals[category] += now - self._mark
+        self._mark = now
+        return now
+
+    def _close_state(self) -> None:
+        now = self._switch()
+        self._event(self._state, self._state, self._state_start, now, _STATE_TID)
+        self._state_start = now
+
+    def _event(self, category: str, name: str | bytes, start: float, end: float, tid: int) -> None:
+        if isinstance(name, bytes):
+            name = name.decode("ascii", "replace").rstrip()
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "tid": tid,
+            }
+        )
+
+
+# Profiler of the runs of this plugin
+PROFILER = RunProfiler()
@@ -0,0 +1,478 @@
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Literal
+
+from pyautolab import api
+from serial.serialutil import SerialException
+
+from pyautolab_OptoSigma.helper.driver import STAGES, StageController
+from pyautolab_OptoSigma.helper.process import _load_class
+
+# Frame header: payload length as unsigned 32 bit big-endian integer
+_HEADER = struct.Struct(">I")
+# Commands a client may call. Commands changing the stage state trigger an immediate status poll.
+_QUERIES = frozenset(("get_speed", "measure_positions", "is_ready", "is_homed"))
+_COMMANDS = frozenset(
+    (
+        "set_stage_speed",
+        "move_stages",
+        "fix_origin",
+        "move_stage_to_mechanical_origin",
+        "stop",
+        "emergency_stop",
+        "jog",
+    )
+)
+
+Address = tuple[str, int] | str
+# Address of `stageServer.address` when the setting is empty
+DEFAULT_ADDRESS = "127.0.0.1:50702"
+
+
+def parse_address(text: str) -> Address:
+    """Parse "host:port" as a TCP address and anything else as the path of a Unix socket."""
+    host, _, port = text.rpartition(":")
+    return (host, int(port)) if host and port.isdigit() else text
+
+
+def format_address(address: Address) -> str:
+    """Format an address as accepted by `parse_address`."""
+    return address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+
+def send_frame(sock: socket.socket, message: dict[str, Any]) -> None:
+    """Send a message as a length-prefixed JSON frame."""
+    payload = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def receive_frame(sock: socket.socket) -> dict[str, Any] | None:
+    """Receive a length-prefixed JSON frame. Return None when the peer closed the connection."""
+    header = _receive_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _receive_exactly(sock, _HEADER.unpack(header)[0])
+    return None if payload is None else json.loads(payload)
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes | None:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            return None
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _create_socket(address: Address) -> socket.socket:
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    return socket.socket(family, socket.SOCK_STREAM)
+
+
+class StageServer:
+    """Server sharing one opened controller with many local clients.
+
+    The server polls the positions and the ready state once per interval while
+    any client is subscribed and sends the same status to every subscriber, so the
+    serial traffic does not grow with the number of clients. Frames are a 4 byte
+    big-endian length followed by a JSON object.
+
+    Parameters
+    ----------
+    device : StageController
+        Opened driver owned by the server.
+    address : tuple[str, int] | str, optional
+        TCP address or path of a Unix socket, by default ("127.0.0.1", 0) which
+        picks a free port.
+    poll_interval : float, optional
+        Interval of the status poll[sec], by default 0.05.
+    """
+
+    def __init__(
+        self, device: StageController, address: Address = ("127.0.0.1", 0), poll_interval: float = 0.05
+    ) -> None:
+        self._device = device
+        self._poll_interval = poll_interval
+        self._device_lock = threading.Lock()
+        self._clients_lock = threading.Lock()
+        self._subscribers: list[socket.socket] = []
+        self._client_locks: dict[socket.socket, threading.Lock] = {}
+        self._poll_requested = threading.Event()
+        self._closed = threading.Event()
+        self._seq = 0
+        self._status: dict[str, Any] | None = None
+        self._listener = _create_socket(address)
+        self._listener.bind(address)
+        self._listener.listen()
+        self.address: Address = self._listener.getsockname()
+
+    def start(self) -> None:
+        """Start accepting clients and polling in background threads."""
+        threading.Thread(target=self._accept, daemon=True).start()
+        threading.Thread(target=self._poll, daemon=True).start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait until the server is closed. Return whether it is closed."""
+        return self._closed.wait(timeout)
+
+    def close(self) -> None:
+        """Stop the server. The device is left opened."""
+        self._closed.set()
+        self._poll_requested.set()
+        self._listener.close()
+        if isinstance(self.address, str):
+            # Otherwise the next server cannot bind the same path
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.address)
+        with self._clients_lock:
+            for client in self._subscribers:
+                client.close()
+            self._subscribers.clear()
+            self._client_locks.clear()
+
+    def _accept(self) -> None:
+        while not self._closed.is_set():
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client: socket.socket) -> None:
+        send_lock = threading.Lock()
+        try:
+            with send_lock:
+                send_frame(client, {"hello": {"model": type(self._device).__name__, **self._device_state()}})
+            while (request := receive_frame(client)) is not None:
+                reply = self._handle(client, send_lock, request)
+                with send_lock:
+                    send_frame(client, reply)
+        except OSError:
+            pass
+        finally:
+            self._unsubscribe(client)
+            client.close()
+
+    def _handle(self, client: socket.socket, send_lock: threading.Lock, request: dict[str, Any]) -> dict[str, Any]:
+        reply: dict[str, Any] = {"id": request.get("id")}
+        if request.get("subscribe"):
+            with self._clients_lock:
+                self._subscribers.append(client)
+                self._client_locks[client] = send_lock
+            self._poll_requested.set()
+            return reply
+        name = request.get("call")
+        if name not in _QUERIES and name not in _COMMANDS:
+            reply["error"] = f"Unknown command: {name}"
+            return reply
+        args = [tuple(arg) if isinstance(arg, list) else arg for arg in request.get("args", [])]
+        try:
+            with self._device_lock:
+                reply["result"] = getattr(self._device, name)(*args)
+                # Status reflecting this call is the next poll
+                reply["seq"] = self._seq + 1
+        except Exception as error:
+            # Any failure of the call goes to the client instead of ending its connection
+            reply["error"] = f"{type(error).__name__}: {error}"
+        reply.update(self._device_state())
+        if name in _COMMANDS:
+            self._poll_requested.set()
+        return reply
+
+    def _device_state(self) -> dict[str, Any]:
+        """State of the driver mirrored by the clients."""
+        stage = self._device.stage
+        return {
+            "axes": self._device.AXES,
+            "stage": None if stage is None else stage.name,
+            "origin_offsets": self._device.origin_offsets,
+        }
+
+    def _poll(self) -> None:
+        while not self._closed.is_set():
+            self._poll_requested.wait(self._poll_interval)
+            self._poll_requested.clear()
+            with self._clients_lock:
+                if not self._subscribers:
+                    continue
+            try:
+                with self._device_lock:
+                    self._seq += 1
+                    self._status = {
+                        "seq": self._seq,
+                        "time": time.time(),
+                        "positions": self._device.measure_positions(),
+                        "ready": self._device.is_ready(),
+                    }
+            except SerialException:
+                continue
+            self._broadcast({"status": self._status})
+
+    def _broadcast(self, message: dict[str, Any]) -> None:
+        with self._clients_lock:
+            subscribers = [(client, self._client_locks[client]) for client in self._subscribers]
+        for client, send_lock in subscribers:
+            try:
+                with send_lock:
+                    send_frame(client, message)
+            except OSError:
+                self._unsubscribe(client)
+
+    def _unsubscribe(self, client: socket.socket) -> None:
+        with self._clients_lock:
+            if client in self._subscribers:
+                self._subscribers.remove(client)
+            self._client_locks.pop(client, None)
+
+
+class RemoteStageController(StageController):
+    """Client of `StageServer` with the same interface as the drivers.
+
+    Positions and ready states come from the status subscription instead of serial
+    queries. After a command, they wait for the first status polled after it. The
+    stage profile and the origin offsets are those of the driver of the server as of
+    the last reply.
+
+    When no server listens at the address and `class_path` is given, `open` starts
+    one owning the driver on `port` and `close` stops it again.
+
+    Parameters
+    ----------
+    address : tuple[str, int] | str | None, optional
+        Address of the server. None reads the `stageServer.address` setting, by default None.
+    class_path : str | None, optional
+        Driver class of a server to start, like `pyautolab_OptoSigma.shot702.driver:Shot702`.
+        None only connects to a running server, by default None.
+    timeout : float, optional
+        Time to wait for a reply or a status[sec], by default 5.0.
+    start_timeout : float, optional
+        Time to wait for a started server to listen[sec], by default 30.0.
+    """
+
+    def __init__(
+        self,
+        address: Address | None = None,
+        class_path: str | None = None,
+        timeout: float = 5.0,
+        start_timeout: float = 30.0,
+    ) -> None:
+        super().__init__()
+        self._address = address
+        self._class_path = class_path
+        self._timeout = timeout
+        self._start_timeout = start_timeout
+        self._server: subprocess.Popen | None = None
+        self._sock: socket.socket | None = None
+        self._send_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._replies: dict[int, dict[str, Any]] = {}
+        self._next_id = 0
+        self._required_seq = 0
+        self.status: dict[str, Any] | None = None
+        self.model = ""
+
+    def open(self) -> None:
+        """Connect to the server, starting it if needed, and subscribe to the status."""
+        address = self._address
+        if address is None:
+            address = parse_address(api.get_setting("stageServer.address") or DEFAULT_ADDRESS)
+        try:
+            self._sock = self._connect(address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if self._class_path is None:
+                raise SerialException(f"No stage server listens at {format_address(address)}.") from None
+            self._sock = self._start_server(address)
+        hello = receive_frame(self._sock)
+        if hello is None or "hello" not in hello:
+            raise SerialException(f"{format_address(address)} is not a stage server.")
+        self.model = hello["hello"]["model"]
+        self.AXES = hello["hello"]["axes"]
+        self._mirror(hello["hello"])
+        self._sock.settimeout(None)
+        threading.Thread(target=self._receive, daemon=True).start()
+        self._request({"subscribe": True})
+
+    def close(self) -> None:
+        """Disconnect from the server. A server started by `open` is stopped, otherwise
+        the controller stays opened by the server.
+        """
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._server is not None:
+            self._server.terminate()
+            self._server.wait(self._start_timeout)
+            self._server = None
+
+    def _connect(self, address: Address) -> socket.socket:
+        sock = _create_socket(address)
+        sock.settimeout(self._timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _start_server(self, address: Address) -> socket.socket:
+        """Start a server owning the driver on `port` and connect to it once it listens."""
+        command = [sys.executable, "-m", __name__, self._class_path, self.port, "--address", format_address(address)]
+        self._server = subprocess.Popen(command)
+        deadline = time.monotonic() + self._start_timeout
+        while True:
+            try:
+                return self._connect(address)
+            except (ConnectionRefusedError, FileNotFoundError):
+                if self._server.poll() is not None:
+                    self._server = None
+                    raise SerialException(f"Stage server for {self.port} exited while starting.") from None
+                if deadline < time.monotonic():
+                    self.close()
+                    raise SerialException(f"Stage server for {self.port} did not start.") from None
+                time.sleep(0.1)
+
+    def get_speed(self) -> list[list[float]]:
+        return self._call("get_speed")
+
+    def set_stage_speed(
+        self,
+        axis: Literal[1, 2],
+        min: int,
+        max: int,
+        acceleration_time: int,
+        original_reset_speed: int | None,
+        mode: str = "D",
+    ) -> None:
+        self._call("set_stage_speed", axis, min, max, acceleration_time, original_reset_speed, mode)
+
+    def measure_positions(self) -> list[float]:
+        return self._latest_status()["positions"]
+
+    def move_stages(self, displacements: tuple[int | None, ...], mode: Literal["A", "M"] = "A") -> None:
+        self._call("move_stages", displacements, mode)
+
+    def is_ready(self) -> list[bool]:
+        return self._latest_status()["ready"]
+
+    def is_homed(self, axis: int) -> bool:
+        # The server records the mechanical origin once homing finished, after the last call
+        return super().is_homed(axis) or self._call("is_homed", axis)
+
+    def fix_origin(self, axis: tuple[bool, ...]) -> None:
+        self._call("fix_origin", axis)
+
+    def move_stage_to_mechanical_origin(self, axis: tuple[bool, ...]) -> None:
+        self._call("move_stage_to_mechanical_origin", axis)
+
+    def stop(self, axis: tuple[bool, ...]) -> None:
+        self._call("stop", axis)
+
+    def emergency_stop(self) -> None:
+        self._call("emergency_stop")
+
+    def jog(self, directions: tuple[Literal["+", "-"] | None, ...]) -> None:
+        self._call("jog", directions)
+
+    def _call(self, name: str, *args: Any) -> Any:
+        reply = self._request({"call": name, "args": args})
+        if name in _COMMANDS:
+            with self._condition:
+                self._required_seq = max(self._required_seq, reply["seq"])
+        return reply.get("result")
+
+    def _request(self, message: dict[str, Any]) -> dict[str, Any]:
+        if self._sock is None:
+            raise SerialException("Not connected to the stage server.")
+        with self._condition:
+            self._next_id += 1
+            request_id = self._next_id
+        with self._send_lock:
+            send_frame(self._sock, {"id": request_id, **message})
+        with self._condition:
+            if not self._condition.wait_for(lambda: request_id in self._replies or self._sock is None, self._timeout):
+                raise SerialException("Stage server did not reply.")
+            if self._sock is None:
+                raise SerialException("Connection to the stage server was lost.")
+            reply = self._replies.pop(request_id)
+        if "origin_offsets" in reply:
+            self._mirror(reply)
+        if "error" in reply:
+            raise SerialException(reply["error"])
+        return reply
+
+    def _mirror(self, state: dict[str, Any]) -> None:
+        """Take over the stage profile and the origin offsets of the driver of the server."""
+        self.stage = STAGES.get(state["stage"]) if state["stage"] is not None else None
+        self.origin_offsets = state["origin_offsets"]
+
+    def _latest_status(self) -> dict[str, Any]:
+        with self._condition:
+            is_fresh = self._condition.wait_for(
+                lambda: self.status is not None and self._required_seq <= self.status["seq"], self._timeout
+            )
+            if not is_fresh or self.status is None:
+                raise SerialException("Stage server sent no status.")
+            return self.status
+
+    def _receive(self) -> None:
+        sock = self._sock
+        try:
+            while sock is not None and (message := receive_frame(sock)) is not None:
+                with self._condition:
+                    if "status" in message:
+                        self.status = message["status"]
+                    else:
+                        self._replies[message["id"]] = message
+                    self._condition.notify_all()
+        except OSError:
+            pass
+        with self._condition:
+            self._sock = None
+            self._condition.notify_all()
+
+
+def _terminate(signum: int, frame: Any) -> None:
+    raise SystemExit(0)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run a server owning a controller until it is interrupted or terminated."""
+    parser = argparse.ArgumentParser(description="Share a stage controller with local clients.")
+    parser.add_argument("driver", help="driver class, e.g. pyautolab_OptoSigma.shot702.driver:Shot702")
+    parser.add_argument("port", help="serial port of the controller")
+    parser.add_argument(
+        "--address", default=DEFAULT_ADDRESS, help=f"host:port or path of a Unix socket (default {DEFAULT_ADDRESS})"
+    )
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="interval of the status poll[sec]")
+    args = parser.parse_args(argv)
+    device = _load_class(args.driver)()
+    device.port = args.port
+    device.open()
+    try:
+        server = StageServer(device, parse_address(args.address), args.poll_interval)
+        # `close` of a client which started the server terminates it. Close the driver as on Ctrl+C.
+        signal.signal(signal.SIGTERM, _terminate)
+        server.start()
+        try:
+            while not server.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    finally:
+        device.close()
+
+
+if __name__ == "__main__":
+    main()
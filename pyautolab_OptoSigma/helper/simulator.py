@@ -0,0 +1,326 @@
+import math
+import re
+import time
+from collections import deque
+from typing import Callable
+
+from pyautolab_OptoSigma.helper.driver import HSC103, SHOT702, StageController, _StageControllerSerial
+
+# Speed[unit/sec] and acceleration/deceleration time[msec] after power-on.
+_DEFAULT_SPEED = {SHOT702: (500, 5000, 200), HSC103: (50000, 500000, 200)}
+_AXES = {SHOT702: 2, HSC103: 3}
+
+
+class _Motion:
+    """Trapezoidal motion of one axis. Positions are mechanical, in controller units."""
+
+    def __init__(self, start: float, target: float, speed: tuple[int, int, int], started_at: float) -> None:
+        self.start = start
+        self.target = target
+        self.started_at = started_at
+        start_speed, max_speed, acceleration_time = speed
+        self._direction = 1 if start <= target else -1
+        self._v0 = float(max(start_speed, 1))
+        vmax = float(max(max_speed, start_speed, 1))
+        distance = abs(target - start)
+        if math.isinf(distance):
+            # Jog: constant speed at the start-up speed
+            self._acceleration = math.inf
+            self._peak, self._t_acc, self._t_cruise = self._v0, 0.0, math.inf
+        elif vmax <= self._v0 or acceleration_time <= 0:
+            self._acceleration = math.inf
+            self._peak, self._t_acc, self._t_cruise = vmax, 0.0, distance / vmax
+            self._v0 = vmax
+        else:
+            self._acceleration = (vmax - self._v0) / (acceleration_time / 1000)
+            ramp = (vmax**2 - self._v0**2) / (2 * self._acceleration)
+            if 2 * ramp <= distance:
+                self._peak, self._t_cruise = vmax, (distance - 2 * ramp) / vmax
+            else:
+                self._peak, self._t_cruise = math.sqrt(self._v0**2 + self._acceleration * distance), 0.0
+            self._t_acc = (self._peak - self._v0) / self._acceleration
+        self.duration = 2 * self._t_acc + self._t_cruise
+
+    def position(self, now: float) -> float:
+        elapsed = now - self.started_at
+        if self.duration <= elapsed:
+            return self.target
+        a, v0, peak, t_acc, t_cruise = self._acceleration, self._v0, self._peak, self._t_acc, self._t_cruise
+        if elapsed < t_acc:
+            travelled = v0 * elapsed + a * elapsed**2 / 2
+        else:
+            travelled = (v0 + peak) / 2 * t_acc + peak * min(elapsed - t_acc, t_cruise)
+            decelerating = elapsed - t_acc - t_cruise
+            if 0 < decelerating:
+                travelled += peak * decelerating - a * decelerating**2 / 2
+        return self.start + self._direction * travelled
+
+
+class _Axis:
+    def __init__(self, speed: tuple[int, int, int]) -> None:
+        self.mechanical = 0.0
+        # Mechanical position of the logical origin
+        self.origin = 0.0
+        self.speed = speed
+        self.return_speed = speed
+        self._motion: _Motion | None = None
+
+    def is_busy(self, now: float) -> bool:
+        self._update(now)
+        return self._motion is not None
+
+    def position(self, now: float) -> int:
+        self._update(now)
+        mechanical = self._motion.position(now) if self._motion else self.mechanical
+        return round(mechanical - self.origin)
+
+    def move(self, logical_target: float, now: float, speed: tuple[int, int, int] | None = None) -> None:
+        self.stop(now)
+        self._motion = _Motion(self.mechanical, logical_target + self.origin, speed or self.speed, now)
+
+    def home(self, now: float) -> None:
+        self.move(-self.origin, now, self.return_speed)
+        self.origin = 0.0
+
+    def jog(self, direction: int, now: float) -> None:
+        self.move(direction * math.inf, now)
+
+    def stop(self, now: float) -> None:
+        if self._motion is not None:
+            self.mechanical = round(self._motion.position(now))
+            self._motion = None
+
+    def _update(self, now: float) -> None:
+        if self._motion is not None and self._motion.duration <= now - self._motion.started_at:
+            self.mechanical = self._motion.target
+            self._motion = None
+
+
+class SimulatedSerial(_StageControllerSerial):
+    """Serial port emulating a Shot702 or Hsc103 controller and its stages.
+
+    Assign it to the `_ser` of a driver before `open()` to run the driver without
+    hardware. Positions and speeds are in controller units (pulse for Shot702 and
+    0.01μm for Hsc103), and motion follows the trapezoidal speed profile set by the
+    speed commands.
+
+    Parameters
+    ----------
+    model : str
+        Controller model to emulate. `SHOT702` or `HSC103`.
+    line_latency : float, optional
+        Round-trip time of each message[sec], by default 0.0.
+    time_scale : float, optional
+        Speed of the simulated time relative to the host clock. Larger values make
+        motions finish sooner, by default 1.0.
+    clock : Callable[[], float], optional
+        Host clock[sec], by default `time.monotonic`.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        line_latency: float = 0.0,
+        time_scale: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__()
+        self.model = model
+        self.line_latency = line_latency
+        self.time_scale = time_scale
+        self._clock = clock
+        self._axes = [_Axis(_DEFAULT_SPEED[model]) for _ in range(_AXES[model])]
+        self._pending: dict[int, float] = {}
+        self._pending_jog: dict[int, int] = {}
+        self._received = b""
+        self._replies: deque[bytes] = deque()
+        # Number of messages received
+        self.message_count = 0
+        # Handler of each message header other than the queries of the status
+        self._handlers: dict[str, Callable[[str, str, float], str]]
+        if model == SHOT702:
+            self._handlers = {
+                "?": self._shot702_query,
+                "S": self._shot702_division,
+                **dict.fromkeys("DV", self._shot702_speed),
+                **dict.fromkeys("AM", self._shot702_move),
+                "J": self._shot702_jog,
+                "G": self._shot702_drive,
+                **dict.fromkeys("RHL", self._shot702_apply),
+            }
+        else:
+            self._handlers = {
+                "?": self._hsc103_query,
+                **dict.fromkeys("DB", self._hsc103_speed),
+                **dict.fromkeys("AM", self._hsc103_move),
+                "J": self._hsc103_jog,
+                **dict.fromkeys("RHL", self._hsc103_apply),
+            }
+
+    def open(self) -> None:
+        self.is_open = True
+
+    def close(self) -> None:
+        self.is_open = False
+
+    def reset_input_buffer(self) -> None:
+        self._replies.clear()
+
+    def reset_output_buffer(self) -> None:
+        self._received = b""
+
+    def write(self, data: bytes) -> int:
+        self._received += data
+        *lines, self._received = self._received.split(self._delimiter)
+        for line in lines:
+            self.message_count += 1
+            reply = self._handle(line.decode("ascii"))
+            self._replies.append(reply.encode("ascii") + self._delimiter)
+        return len(data)
+
+    def readline(self, size: int = -1) -> bytes:
+        if self.line_latency:
+            time.sleep(self.line_latency)
+        return self._replies.popleft() if self._replies else b""
+
+    def _now(self) -> float:
+        return self._clock() * self.time_scale
+
+    def _handle(self, message: str) -> str:
+        now = self._now()
+        if message == "Q:":
+            positions = [axis.position(now) for axis in self._axes]
+            if self.model == HSC103:
+                return ",".join(str(position) for position in positions)
+            ready = "B" if any(axis.is_busy(now) for axis in self._axes) else "R"
+            # Sign first, then the digits right-aligned, e.g. "-     1000" and "      1000"
+            fields = (f"{'-' if position < 0 else ' '}{abs(position):>9}" for position in positions)
+            return ",".join(fields) + f",K,K,{ready}"
+        if message == "!:":
+            if self.model == HSC103:
+                return ",".join(str(int(axis.is_busy(now))) for axis in self._axes)
+            return "B" if any(axis.is_busy(now) for axis in self._axes) else "R"
+        if message == "L:E":
+            for axis in self._axes:
+                axis.stop(now)
+            return "OK"
+        header, _, body = message.partition(":")
+        handler = self._handlers.get(header)
+        if handler is None:
+            return "NG"
+        try:
+            return handler(header, body, now)
+        except (ValueError, IndexError, KeyError):
+            return "NG"
+
+    def _shot702_axes(self, option: str) -> list[int]:
+        return {"1": [0], "2": [1], "W": [0, 1]}[option]
+
+    def _shot702_query(self, header: str, body: str, now: float) -> str:
+        if body != "DW":
+            raise ValueError(body)
+        return "".join(f"S{axis.speed[0]}F{axis.speed[1]}R{axis.speed[2]}" for axis in self._axes)
+
+    def _shot702_division(self, header: str, body: str, now: float) -> str:
+        return "OK"
+
+    def _shot702_speed(self, header: str, body: str, now: float) -> str:
+        values = [int(value) for value in re.findall(r"[SFR](\d+)", body)]
+        for i, axis_index in enumerate(self._shot702_axes(body[0])):
+            speed = (values[3 * i], values[3 * i + 1], values[3 * i + 2])
+            if header == "D":
+                self._axes[axis_index].speed = speed
+            else:
+                self._axes[axis_index].return_speed = speed
+        return "OK"
+
+    def _shot702_move(self, header: str, body: str, now: float) -> str:
+        pulses = [int(sign + value) for sign, value in re.findall(r"([+-])P(\d+)", body)]
+        for axis_index, pulse in zip(self._shot702_axes(body[0]), pulses):
+            self._pending[axis_index] = pulse + (self._axes[axis_index].position(now) if header == "M" else 0)
+        return "OK"
+
+    def _shot702_jog(self, header: str, body: str, now: float) -> str:
+        for axis_index, sign in zip(self._shot702_axes(body[0]), body[1:]):
+            self._pending_jog[axis_index] = 1 if sign == "+" else -1
+        return "OK"
+
+    def _shot702_drive(self, header: str, body: str, now: float) -> str:
+        for axis_index, target in self._pending.items():
+            self._axes[axis_index].move(target, now)
+        for axis_index, direction in self._pending_jog.items():
+            self._axes[axis_index].jog(direction, now)
+        self._pending.clear()
+        self._pending_jog.clear()
+        return "OK"
+
+    def _shot702_apply(self, header: str, body: str, now: float) -> str:
+        for axis_index in self._shot702_axes(body):
+            self._apply(header, self._axes[axis_index], now)
+        return "OK"
+
+    def _hsc103_query(self, header: str, body: str, now: float) -> str:
+        if not body.startswith("D"):
+            raise ValueError(body)
+        return ",".join(str(value) for value in self._axes[int(body[1:]) - 1].speed)
+
+    def _hsc103_speed(self, header: str, body: str, now: float) -> str:
+        fields = body.split(",")
+        axis = self._axes[int(fields[0]) - 1]
+        speed = (int(fields[1]), int(fields[2]), int(fields[3]))
+        if header == "D":
+            axis.speed = speed
+        else:
+            axis.return_speed = speed
+        if len(fields) == 5:
+            axis.return_speed = (speed[0], int(fields[4]), speed[2])
+        return "OK"
+
+    def _hsc103_move(self, header: str, body: str, now: float) -> str:
+        for axis, field in zip(self._axes, body.split(",")):
+            if field:
+                axis.move(int(field) + (axis.position(now) if header == "M" else 0), now)
+        return "OK"
+
+    def _hsc103_jog(self, header: str, body: str, now: float) -> str:
+        for axis, field in zip(self._axes, body.split(",")):
+            if field:
+                axis.jog(1 if field == "+" else -1, now)
+        return "OK"
+
+    def _hsc103_apply(self, header: str, body: str, now: float) -> str:
+        for axis, field in zip(self._axes, body.split(",")):
+            if field == "1":
+                self._apply(header, axis, now)
+        return "OK"
+
+    def _apply(self, header: str, axis: _Axis, now: float) -> None:
+        if header == "R":
+            axis.origin += axis.position(now)
+        elif header == "H":
+            axis.home(now)
+        else:
+            axis.stop(now)
+
+
+def simulate(device: StageController, line_latency: float = 0.0, time_scale: float = 1.0) -> SimulatedSerial:
+    """Replace the serial port of a driver with a simulator of its controller.
+
+    Parameters
+    ----------
+    device : StageController
+        Driver not yet opened.
+    line_latency : float, optional
+        Round-trip time of each message[sec], by default 0.0.
+    time_scale : float, optional
+        Speed of the simulated time relative to the host clock, by default 1.0.
+
+    Returns
+    -------
+    SimulatedSerial
+        Simulator assigned to the driver.
+    """
+    model = next(cls.__name__ for cls in type(device).__mro__ if cls.__name__ in _AXES)
+    simulator = SimulatedSerial(model, line_latency, time_scale)
+    device._ser = simulator
+    return simulator
@@ -0,0 +1,46 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+# Directory in which the plugin persists state between sessions.
+STATE_DIR = Path.home() / ".pyautolab-OptoSigma"
+
+
+def load_state(name: str) -> dict[str, Any]:
+    """Load persisted state.
+
+    Parameters
+    ----------
+    name : str
+        File name of the state in `STATE_DIR`.
+
+    Returns
+    -------
+    dict[str, Any]
+        Persisted state. Empty when nothing was persisted or the file is broken.
+    """
+    try:
+        with (STATE_DIR / name).open(encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def save_state(name: str, state: dict[str, Any]) -> None:
+    """Persist state atomically, so that a crash never leaves a half-written file.
+
+    Parameters
+    ----------
+    name : str
+        File name of the state in `STATE_DIR`.
+    state : dict[str, Any]
+        State to persist. Must be serializable to JSON.
+    """
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    path = STATE_DIR / name
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, path)
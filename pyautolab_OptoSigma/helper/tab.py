@@ -1,9 +1,15 @@
+from pathlib import Path
+
+import numpy as np
 import qtawesome as qta
 from pyautolab import api
 from qtpy.QtCore import Qt, Slot  # type: ignore
 from qtpy.QtWidgets import QButtonGroup, QFormLayout, QGridLayout, QGroupBox, QSpinBox, QWidget
 
 from pyautolab_OptoSigma.helper.driver import StageController
+from pyautolab_OptoSigma.helper.profiler import DWELL, IDLE, MOTION_WAIT, PROFILER
+from pyautolab_OptoSigma.helper.timing import TimingRecorder, TimingSummary, timing_directory
+from pyautolab_OptoSigma.helper.validation import ValidationReport, cycle_program, step_program, validate_program
 
 
 class TabUI:
@@ -55,6 +61,68 @@ class TabUI:
         g_layout.addLayout(f_layout, 1, 0, 1, 2)
 
 
+def preflight(
+    device: StageController, targets: np.ndarray, speed: tuple[int, int, int], dwell_time: float
+) -> ValidationReport:
+    """Validate a program which starts by fixing the origin at the current position.
+
+    Parameters
+    ----------
+    device : StageController
+        Opened driver.
+    targets : np.ndarray
+        Absolute targets[μm] from the fixed origin of shape (moves, axes).
+    speed : tuple[int, int, int]
+        Start-up speed[μm/sec], maximum speed[μm/sec] and acceleration/deceleration
+        time[msec].
+    dwell_time : float
+        Stop time after each move[sec].
+
+    Returns
+    -------
+    ValidationReport
+        Report of the valid program.
+
+    Raises
+    ------
+    ValueError
+        If the stage profile of the driver is unknown or the program violates the
+        limits of the stage.
+    """
+    if device.stage is None:
+        raise ValueError("The stage profile is unknown, so the travel range and speed limits cannot be checked.")
+    offsets = device.origin_offsets[: targets.shape[1]]
+    if any(offset is not None for offset in offsets):
+        positions = device.measure_positions()
+        offsets = [None if offset is None else offset + position for offset, position in zip(offsets, positions)]
+    report = validate_program(targets, device.stage, speed, origin_offsets=offsets, dwell_time=dwell_time)
+    if not report.ok:
+        raise ValueError(report.message())
+    return report
+
+
+def save_timing(timing: TimingRecorder, directory: Path | None, name: str) -> Path | None:
+    """Save the timing report of a stopped run, unless no directory is set or nothing ran."""
+    if directory is None or not timing.started:
+        return None
+    try:
+        return timing.save(directory, name)
+    except OSError:
+        # The report must never break stopping the stages
+        return None
+
+
+def save_trace(directory: Path | None) -> Path | None:
+    """Save the timeline of `PROFILER` for a stopped run, unless profiling is off or no directory is set."""
+    PROFILER.end()
+    if directory is None or not PROFILER.enabled:
+        return None
+    try:
+        return PROFILER.save_trace(directory)
+    except OSError:
+        return None
+
+
 class Step(api.Controller):
     def __init__(
         self, device: StageController, stop_time: int, step_num: int, distance: int, judge_ready_interval: int
@@ -66,30 +134,60 @@ class Step(api.Controller):
         self._distance = distance
         self._count = 1
         self._judge_ready_interval = judge_ready_interval
+        self.preflight: ValidationReport | None = None
+        self.timing = TimingRecorder(stop_time / 1000, judge_ready_interval / 1000)
+        # Directory to save the timing report in when the run stops. None does not save.
+        self.timing_directory: Path | None = None
+        self.timing_report: Path | None = None
+        # Timeline of the run saved when `PROFILER` is enabled
+        self.trace: Path | None = None
+        self._stopped = False
 
     def start(self) -> None:
         # TODO: When implement thread, remove timer.
+        self.timing.begin()
+        PROFILER.begin("step")
         self._timer_move_stage = api.qt.timer(
             self, timeout=self._step, enable_count=True, timer_type=Qt.TimerType.PreciseTimer
         )
         self._device.fix_origin((True, False, False))
         self._timer_move_stage.start(self._judge_ready_interval)
+        PROFILER.start_timer("step", self._judge_ready_interval / 1000)
 
     @Slot()
     def _step(self) -> None:
         # TODO: When implement thread, change event loop sleep to built-in sleep.
-        if self._device.is_ready()[0]:
+        with PROFILER.timer_slot("step"):
+            if not self._device.is_ready()[0]:
+                self.timing.mark_busy()
+                PROFILER.set_state(MOTION_WAIT)
+                return
+            self.timing.mark_ready()
+            PROFILER.set_state(IDLE)
+            PROFILER.operation(self._count)
             self._device.move_stages((self._distance, None, None), "M")
+            self.timing.mark_start()
             self._count += 1
-            if self._step_num <= self._count:
-                self.stop()
-                return
-            api.qt.sleep_non_block_window(self._stop_time)
+            finished = self._step_num <= self._count
+            if not finished:
+                with self.timing.dwelling(), PROFILER.span(DWELL):
+                    api.qt.sleep_non_block_window(self._stop_time)
+        # Stop outside the slot, so that the saved trace includes all of it
+        if finished:
+            self.stop()
 
     def stop(self) -> None:
         self._timer_move_stage.stop()
+        if not self._stopped:
+            self._stopped = True
+            self.timing_report = save_timing(self.timing, self.timing_directory, "step")
+            self.trace = save_trace(self.timing_directory)
         return super().stop()
 
+    def timing_summary(self) -> TimingSummary:
+        """Summarize the scheduling accuracy of the run so far."""
+        return self.timing.summary()
+
 
 class Cycle(api.Controller):
     def __init__(
@@ -102,27 +200,101 @@ class Cycle(api.Controller):
         self._distance = distance
         self._stop_time = stop_time
         self._judge_ready_interval = judge_ready_interval
+        self.preflight: ValidationReport | None = None
+        self.timing = TimingRecorder(stop_time / 1000, judge_ready_interval / 1000)
+        # Directory to save the timing report in when the run stops. None does not save.
+        self.timing_directory: Path | None = None
+        self.timing_report: Path | None = None
+        # Timeline of the run saved when `PROFILER` is enabled
+        self.trace: Path | None = None
+        self._stopped = False
 
     def start(self) -> None:
         # TODO: When implement thread, remove timer.
+        self.timing.begin()
+        PROFILER.begin("cycle")
         self._timer_move_stage = api.qt.timer(
             self, timeout=self._cycle, enable_count=True, timer_type=Qt.TimerType.PreciseTimer
         )
         self._device.fix_origin((True, False, False))
         self._timer_move_stage.start(self._judge_ready_interval)
+        PROFILER.start_timer("cycle", self._judge_ready_interval / 1000)
 
     def _cycle(self) -> None:
         # TODO: When implement thread, remove timer
-        if self._device.is_ready()[0]:
+        with PROFILER.timer_slot("cycle"):
+            if not self._device.is_ready()[0]:
+                self.timing.mark_busy()
+                PROFILER.set_state(MOTION_WAIT)
+                return
+            self.timing.mark_ready()
+            PROFILER.set_state(IDLE)
+            PROFILER.operation(self._count)
             move_position = self._distance if self._count % 2 else 0
             self._device.move_stages((move_position, None, None))
+            self.timing.mark_start()
             self._count += 1
-            if self._cycle_num <= self._count - 2:
-                self.stop()
-                return
-            api.qt.sleep_non_block_window(self._stop_time)
+            finished = self._cycle_num <= self._count - 2
+            if not finished:
+                with self.timing.dwelling(), PROFILER.span(DWELL):
+                    api.qt.sleep_non_block_window(self._stop_time)
+        # Stop outside the slot, so that the saved trace includes all of it
+        if finished:
+            self.stop()
 
     def stop(self) -> None:
         self._timer_move_stage.stop()
         self._device.emergency_stop()
+        if not self._stopped:
+            self._stopped = True
+            self.timing_report = save_timing(self.timing, self.timing_directory, "cycle")
+            self.trace = save_trace(self.timing_directory)
         return super().stop()
+
+    def timing_summary(self) -> TimingSummary:
+        """Summarize the scheduling accuracy of the run so far."""
+        return self.timing.summary()
+
+
+def build_controller(device: StageController, ui: TabUI, prefix: str) -> Step | Cycle:
+    """Validate the program set in the tab and build the controller running it.
+
+    Parameters
+    ----------
+    device : StageController
+        Opened driver.
+    ui : TabUI
+        UI of the tab holding the program.
+    prefix : str
+        Prefix of the settings of the controller model, e.g. "shot702".
+
+    Returns
+    -------
+    Step | Cycle
+        Controller with the preflight report and the timing directory set.
+
+    Raises
+    ------
+    ValueError
+        If the program violates the limits of the stage.
+    """
+    stop_time = ui.spinbox_stop_interval.value()
+    operation_num = ui.spinbox_operation_num.value()
+    distance = ui.spinbox_distance.value()
+    judge_ready_interval = int(api.get_setting(f"{prefix}.judgeReadyInterval"))
+    speed = ui.slider_speed.current_value
+    acceleration_time = int(api.get_setting(f"{prefix}.accelerationAndDecelerationTime"))
+
+    is_cycle = ui.p_btn_cycle_mode.isChecked()
+    targets = cycle_program(distance, operation_num) if is_cycle else step_program(distance, operation_num)
+    report = preflight(device, targets, (speed, speed, acceleration_time), stop_time / 1000)
+
+    controller_type = Cycle if is_cycle else Step
+    controller = controller_type(device, stop_time, operation_num, distance, judge_ready_interval)
+    controller.preflight = report
+    controller.timing_directory = timing_directory(str(api.get_setting(f"{prefix}.timingReportDirectory")))
+    if api.get_setting(f"{prefix}.profileRuns"):
+        PROFILER.enable()
+    else:
+        PROFILER.disable()
+    return controller
@@ -0,0 +1,172 @@
+import json
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
+
+from pyautolab_OptoSigma.helper import storage
+
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass(frozen=True)
+class TimingSummary:
+    # Number of started operations
+    operations: int
+    # Delay of the actual start behind the commanded start[msec] for "p50", "p90", "p99" and "max"
+    start_jitter: dict[str, float]
+    # Actual minus commanded stop time[msec]
+    dwell_error: dict[str, float]
+    # Time from the start until the stage was observed ready[msec]
+    move_duration: dict[str, float]
+    # Number of operations whose stage was still moving when the stop time ended
+    move_bound: int
+    # Sum of the start delays[sec]
+    total_overhead: float
+    # Time from the start of the run until the last start[sec]
+    elapsed: float
+
+
+def _distribution(values: np.ndarray) -> dict[str, float]:
+    values = values[~np.isnan(values)] * 1000
+    if len(values) == 0:
+        return {}
+    distribution = {f"p{q}": float(value) for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    distribution["max"] = float(values.max())
+    return distribution
+
+
+class TimingRecorder:
+    """Record commanded and actual timing of the operations of a Step or Cycle run.
+
+    An operation is due `stop_time` after the previous one started, and the first one
+    is due `first_delay` after `begin`. Times are measured from `begin`. The move
+    duration ends when the stage is first observed ready, so it includes the latency
+    of the ready polling.
+
+    Parameters
+    ----------
+    stop_time : float
+        Commanded stop time after each start[sec].
+    first_delay : float
+        Commanded delay of the first operation, i.e. the ready polling interval[sec].
+    clock : Callable[[], float], optional
+        Clock[sec], by default `time.perf_counter`.
+    """
+
+    def __init__(self, stop_time: float, first_delay: float, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.stop_time = stop_time
+        self.first_delay = first_delay
+        self._clock = clock
+        self._origin = clock()
+        self.commanded: list[float] = []
+        self.started: list[float] = []
+        self.ready: list[float] = []
+        self.dwell: list[float] = []
+        self.busy: list[int] = []
+
+    def begin(self) -> None:
+        """Start the clock of the run and forget previous records."""
+        self._origin = self._clock()
+        self.commanded.clear()
+        self.started.clear()
+        self.ready.clear()
+        self.dwell.clear()
+        self.busy.clear()
+
+    def mark_ready(self) -> None:
+        """Record that the stage was observed ready. Only the first call after a start counts."""
+        if self.started and math.isnan(self.ready[-1]):
+            self.ready[-1] = self._now()
+
+    def mark_busy(self) -> None:
+        """Record that the stage was observed moving. Only counts after the stop time ended."""
+        if self.started and not math.isnan(self.dwell[-1]):
+            self.busy[-1] += 1
+
+    def mark_start(self) -> None:
+        """Record that the move of the next operation was commanded to the controller."""
+        now = self._now()
+        self.commanded.append(self.started[-1] + self.stop_time if self.started else self.first_delay)
+        self.started.append(now)
+        self.ready.append(math.nan)
+        self.dwell.append(math.nan)
+        self.busy.append(0)
+
+    @contextmanager
+    def dwelling(self) -> Iterator[None]:
+        """Measure the stop time actually spent in the block after the last start."""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            if self.dwell:
+                self.dwell[-1] = self._clock() - start
+
+    def summary(self) -> TimingSummary:
+        """Summarize the recorded operations."""
+        commanded = np.array(self.commanded)
+        started = np.array(self.started)
+        ready = np.array(self.ready)
+        jitter = started - commanded
+        return TimingSummary(
+            operations=len(started),
+            start_jitter=_distribution(jitter),
+            dwell_error=_distribution(np.array(self.dwell) - self.stop_time),
+            move_duration=_distribution(ready - started),
+            move_bound=sum(1 for busy in self.busy if busy),
+            total_overhead=float(np.clip(jitter, 0, None).sum()),
+            elapsed=float(started[-1]) if len(started) else 0.0,
+        )
+
+    def save(self, directory: Path, name: str) -> Path:
+        """Save the summary and the records of every operation as JSON.
+
+        Parameters
+        ----------
+        directory : Path
+            Directory to save in.
+        name : str
+            Name of the run, e.g. "step". The file is named `<name>-timing-<date>.json`.
+
+        Returns
+        -------
+        Path
+            Saved file.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}-timing-{datetime.now():%Y%m%d-%H%M%S}.json"
+        operations = [
+            {
+                "commanded": commanded,
+                "started": started,
+                "ready": None if math.isnan(ready) else ready,
+                "dwell": None if math.isnan(dwell) else dwell,
+                "busy_polls": busy,
+            }
+            for commanded, started, ready, dwell, busy in zip(
+                self.commanded, self.started, self.ready, self.dwell, self.busy
+            )
+        ]
+        report = {
+            "stop_time": self.stop_time,
+            "first_delay": self.first_delay,
+            "summary": asdict(self.summary()),
+            "operations": operations,
+        }
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        return path
+
+    def _now(self) -> float:
+        return self._clock() - self._origin
+
+
+def timing_directory(setting: str) -> Path:
+    """Return the directory of the timing reports from the setting. Empty means `STATE_DIR/timing`."""
+    return Path(setting).expanduser() if setting else storage.STATE_DIR / "timing"
@@ -0,0 +1,211 @@
+import time
+from dataclasses import asdict, dataclass
+from itertools import product
+
+from pyautolab_OptoSigma.helper.driver import StageController
+from pyautolab_OptoSigma.helper.storage import load_state, save_state
+
+TUNING_STATE = "tuning.json"
+# Relative moves[μm] run for every candidate setting. Each is followed by the move back.
+STANDARD_MOVES = (10, 100, 1000, 10000)
+
+
+@dataclass(frozen=True)
+class TuningResult:
+    # μm/sec
+    start_speed: int
+    # μm/sec
+    max_speed: int
+    # msec
+    acceleration_time: int
+    # Mean time from the move command until the controller is ready[sec]
+    move_time: float
+    # Maximum difference between the commanded and the reported position[μm]
+    arrival_error: float
+    # Mean time from the controller being ready until the position stops changing[sec]
+    settle_time: float
+
+    def dominates(self, other: "TuningResult") -> bool:
+        """Check whether this result is no worse than `other` in every measure and better in one."""
+        mine = (self.move_time, self.arrival_error, self.settle_time)
+        theirs = (other.move_time, other.arrival_error, other.settle_time)
+        return all(a <= b for a, b in zip(mine, theirs)) and mine != theirs
+
+
+def measure_setting(
+    device: StageController,
+    axis: int,
+    start_speed: int,
+    max_speed: int,
+    acceleration_time: int,
+    moves: tuple[int, ...] = STANDARD_MOVES,
+    poll_interval: float = 0.005,
+    settle_window: float = 0.05,
+    timeout: float = 60.0,
+) -> TuningResult:
+    """Run the move set with a speed setting and measure it.
+
+    Positions come from `measure_positions`, i.e. the pulse counter the controller
+    reports for `Q:`. The stages run in open loop, so the counter always ends at the
+    commanded position and does not change after the controller is ready. Arrival
+    error and settle time therefore read 0 on real hardware, and only the move time
+    compares the settings.
+
+    Parameters
+    ----------
+    device : StageController
+        Opened driver.
+    axis : int
+        Number of stage to tune. Starts from 1.
+    start_speed : int
+        [μm/sec]
+    max_speed : int
+        [μm/sec]
+    acceleration_time : int
+        [msec]
+    moves : tuple[int, ...], optional
+        Relative moves[μm], by default `STANDARD_MOVES`.
+    poll_interval : float, optional
+        Interval of the status queries[sec], by default 0.005.
+    settle_window : float, optional
+        Time the position must stay unchanged to be settled[sec], by default 0.05.
+    timeout : float, optional
+        Time to wait for each move[sec], by default 60.0.
+
+    Returns
+    -------
+    TuningResult
+        Measured performance of the setting.
+    """
+    device.set_stage_speed(axis, start_speed, max_speed, acceleration_time, None)
+    move_times: list[float] = []
+    settle_times: list[float] = []
+    arrival_error = 0.0
+    for move in moves:
+        for displacement in (move, -move):
+            expected = device.measure_positions()[axis - 1] + displacement
+            displacements: list[int | None] = [None] * device.AXES
+            displacements[axis - 1] = displacement
+            started_at = time.perf_counter()
+            device.move_stages(tuple(displacements), "M")
+            while not all(device.is_ready()):
+                if timeout < time.perf_counter() - started_at:
+                    device.emergency_stop()
+                    raise TimeoutError(f"Move of {displacement}μm did not finish in {timeout} sec.")
+                time.sleep(poll_interval)
+            ready_at = time.perf_counter()
+            move_times.append(ready_at - started_at)
+
+            position = device.measure_positions()[axis - 1]
+            changed_at = ready_at
+            while time.perf_counter() - changed_at < settle_window:
+                time.sleep(poll_interval)
+                current = device.measure_positions()[axis - 1]
+                if current != position:
+                    position, changed_at = current, time.perf_counter()
+            settle_times.append(changed_at - ready_at)
+            arrival_error = max(arrival_error, abs(position - expected))
+    return TuningResult(
+        start_speed=start_speed,
+        max_speed=max_speed,
+        acceleration_time=acceleration_time,
+        move_time=sum(move_times) / len(move_times),
+        arrival_error=round(arrival_error, 2),
+        settle_time=sum(settle_times) / len(settle_times),
+    )
+
+
+def pareto_front(results: list[TuningResult]) -> list[TuningResult]:
+    """Return the results not dominated by any other, fastest first."""
+    front = [result for result in results if not any(other.dominates(result) for other in results)]
+    return sorted(front, key=lambda result: result.move_time)
+
+
+def tune_stage_speed(
+    device: StageController,
+    axis: int,
+    max_speeds: tuple[int, ...],
+    acceleration_times: tuple[int, ...],
+    start_speed: int = 500,
+    moves: tuple[int, ...] = STANDARD_MOVES,
+    save: bool = True,
+) -> list[TuningResult]:
+    """Sweep speed and acceleration settings over the move set and report the
+    Pareto-optimal ones.
+
+    The stage returns to its starting position after every move, and the speed
+    setting of the axis is restored after the sweep, also when it fails.
+
+    Parameters
+    ----------
+    device : StageController
+        Opened driver. Real controller or `SimulatedSerial`.
+    axis : int
+        Number of stage to tune. Starts from 1.
+    max_speeds : tuple[int, ...]
+        Candidates of maximum speed[μm/sec].
+    acceleration_times : tuple[int, ...]
+        Candidates of acceleration/deceleration time[msec].
+    start_speed : int, optional
+        Start-up speed[μm/sec], by default 500.
+    moves : tuple[int, ...], optional
+        Relative moves[μm], by default `STANDARD_MOVES`.
+    save : bool, optional
+        Whether to store the results for the stage of the device, by default True.
+
+    Returns
+    -------
+    list[TuningResult]
+        Pareto-optimal settings, fastest first.
+
+    Raises
+    ------
+    ValueError
+        If `save` is True and the stage of the device is unknown. Checked before the sweep.
+    """
+    if save and device.stage is None:
+        raise ValueError("Stage of the device is unknown.")
+    speed_before = device.get_speed()[axis - 1]
+    try:
+        results = [
+            measure_setting(device, axis, min(start_speed, max_speed), max_speed, acceleration_time, moves)
+            for max_speed, acceleration_time in product(max_speeds, acceleration_times)
+        ]
+    finally:
+        # `measure_setting` returns with the stage ready or stopped by `emergency_stop`
+        device.set_stage_speed(axis, round(speed_before[0]), round(speed_before[1]), int(speed_before[2]), None)
+    front = pareto_front(results)
+    if save and device.stage is not None:
+        save_tuning(device.stage.name, front)
+    return front
+
+
+def save_tuning(stage: str, results: list[TuningResult]) -> None:
+    """Store tuning results for a stage type.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage type.
+    results : list[TuningResult]
+        Results to store. Replace the stored ones.
+    """
+    state = load_state(TUNING_STATE)
+    state[stage] = [asdict(result) for result in results]
+    save_state(TUNING_STATE, state)
+
+
+def load_tuning(stage: str) -> list[TuningResult]:
+    """Load the tuning results stored for a stage type.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage type.
+
+    Returns
+    -------
+    list[TuningResult]
+        Stored results. Empty when the stage has not been tuned.
+    """
+    return [TuningResult(**result) for result in load_state(TUNING_STATE).get(stage, [])]
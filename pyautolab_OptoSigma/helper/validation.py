@@ -0,0 +1,264 @@
+from dataclasses import dataclass
+from typing import Literal
+
+import numpy as np
+
+from pyautolab_OptoSigma.helper.driver import Stage
+from pyautolab_OptoSigma.helper.plan import ScanPlan
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    # Number of checked moves
+    moves: int
+    # Indices of the moves whose target is outside the travel range of the stage
+    out_of_travel: np.ndarray
+    # Speed settings the stage cannot follow
+    speed_errors: tuple[str, ...]
+    # Estimated run time including dwell and overhead[sec]
+    estimated_runtime: float
+
+    @property
+    def ok(self) -> bool:
+        return len(self.out_of_travel) == 0 and not self.speed_errors
+
+    def message(self) -> str:
+        """Describe the violations for the user."""
+        messages = list(self.speed_errors)
+        if len(self.out_of_travel):
+            messages.append(
+                f"{len(self.out_of_travel)} of {self.moves} moves leave the travel range. "
+                f"The first one is move {self.out_of_travel[0]}."
+            )
+        return "\n".join(messages)
+
+
+def move_times(distances: np.ndarray, start_speed: float, max_speed: float, acceleration_time: int) -> np.ndarray:
+    """Estimate durations of trapezoidal moves.
+
+    Parameters
+    ----------
+    distances : np.ndarray
+        Absolute move distances[μm].
+    start_speed : float
+        [μm/sec]
+    max_speed : float
+        [μm/sec]
+    acceleration_time : int
+        [msec]
+
+    Returns
+    -------
+    np.ndarray
+        Durations[sec] with the same shape as `distances`.
+    """
+    start_speed = max(start_speed, 1.0)
+    max_speed = max(max_speed, start_speed)
+    if max_speed == start_speed or acceleration_time <= 0:
+        return distances / max_speed
+    acceleration = (max_speed - start_speed) / (acceleration_time / 1000)
+    ramp = (max_speed**2 - start_speed**2) / (2 * acceleration)
+    peak = np.sqrt(start_speed**2 + acceleration * distances)
+    return np.where(
+        2 * ramp <= distances,
+        2 * acceleration_time / 1000 + (distances - 2 * ramp) / max_speed,
+        2 * (peak - start_speed) / acceleration,
+    )
+
+
+class _Validator:
+    """Validate moves chunk by chunk, carrying the positions over chunks."""
+
+    def __init__(
+        self,
+        stage: Stage | None,
+        start: np.ndarray,
+        origin_offsets: list[float | None],
+        speed: tuple[int, int, int],
+        dwell_time: float,
+        overhead: float,
+    ) -> None:
+        self._stage = stage
+        self._position = start.astype(np.float64)
+        self._offsets = np.array([np.nan if offset is None else offset for offset in origin_offsets])
+        self._span_min = self._position.copy()
+        self._span_max = self._position.copy()
+        self._speed = speed
+        self._dwell_time = dwell_time
+        self._overhead = overhead
+        self.moves = 0
+        self.runtime = 0.0
+        self.out_of_travel: list[np.ndarray] = []
+
+    def feed(self, targets: np.ndarray) -> None:
+        """Validate absolute logical targets[μm] of shape (moves, axes). NaN keeps the axis still."""
+        if len(targets) == 0:
+            return
+        # Forward fill NaN with the previous target of the axis
+        filled = np.vstack((self._position, targets))
+        held = np.isnan(filled)
+        index = np.where(held, 0, np.arange(len(filled))[:, np.newaxis])
+        np.maximum.accumulate(index, axis=0, out=index)
+        filled = np.take_along_axis(filled, index, axis=0)
+
+        distances = np.abs(np.diff(filled, axis=0))
+        durations = move_times(distances, *self._speed).max(axis=1)
+        self.runtime += float(durations.sum()) + len(targets) * (self._dwell_time + self._overhead)
+
+        if self._stage is not None:
+            positions = filled[1:]
+            travel = self._stage.travel_max - self._stage.travel_min
+            known = ~np.isnan(self._offsets)
+            mechanical = positions[:, known] + self._offsets[known]
+            outside = ((mechanical < self._stage.travel_min) | (self._stage.travel_max < mechanical)).any(axis=1)
+            # Without a mechanical origin only the extent of the motion can be checked
+            unknown = ~known
+            span_max = np.fmax.accumulate(np.vstack((self._span_max, positions)), axis=0)[1:, unknown]
+            span_min = np.fmin.accumulate(np.vstack((self._span_min, positions)), axis=0)[1:, unknown]
+            outside |= (travel < span_max - span_min).any(axis=1)
+            self.out_of_travel.append(np.flatnonzero(outside) + self.moves)
+            self._span_max = np.fmax(self._span_max, positions.max(axis=0))
+            self._span_min = np.fmin(self._span_min, positions.min(axis=0))
+
+        self._position = filled[-1]
+        self.moves += len(targets)
+
+    def report(self) -> ValidationReport:
+        out_of_travel = np.concatenate(self.out_of_travel) if self.out_of_travel else np.zeros(0, dtype=np.intp)
+        return ValidationReport(self.moves, out_of_travel, _check_speed(self._stage, *self._speed), self.runtime)
+
+
+def _check_speed(stage: Stage | None, start_speed: int, max_speed: int, acceleration_time: int) -> tuple[str, ...]:
+    if stage is None:
+        return ()
+    errors = []
+    if stage.max_speed * 1000 < max_speed:
+        errors.append(f"Speed {max_speed}μm/sec exceeds {stage.max_speed * 1000}μm/sec of {stage.name}.")
+    if max_speed > start_speed:
+        acceleration = (max_speed - start_speed) / (max(acceleration_time, 1) / 1000)
+        if stage.max_acceleration < acceleration:
+            errors.append(
+                f"Acceleration {acceleration:.0f}μm/sec^2 exceeds {stage.max_acceleration}μm/sec^2 of {stage.name}."
+                " Lengthen the acceleration/deceleration time."
+            )
+    return tuple(errors)
+
+
+def validate_program(
+    targets: np.ndarray,
+    stage: Stage | None,
+    speed: tuple[int, int, int],
+    start: np.ndarray | None = None,
+    origin_offsets: list[float | None] | None = None,
+    dwell_time: float = 0.0,
+    overhead: float = 0.0,
+) -> ValidationReport:
+    """Check a whole motion program against the stage limits and estimate its run time.
+
+    Parameters
+    ----------
+    targets : np.ndarray
+        Absolute logical targets[μm] of shape (moves, axes). NaN keeps the axis still.
+    stage : Stage | None
+        Profile of the stage. When None, only the run time is estimated.
+    speed : tuple[int, int, int]
+        Start-up speed[μm/sec], maximum speed[μm/sec] and acceleration/deceleration
+        time[msec].
+    start : np.ndarray | None, optional
+        Logical positions[μm] before the first move, by default zeros.
+    origin_offsets : list[float | None] | None, optional
+        Position of the logical origin seen from the mechanical origin of each
+        axis[μm]. For axes whose offset is None only the extent of the motion is
+        checked, by default all None.
+    dwell_time : float, optional
+        Stop time after each move[sec], by default 0.0.
+    overhead : float, optional
+        Communication and scheduling time of each move[sec], by default 0.0.
+
+    Returns
+    -------
+    ValidationReport
+        Violations and the estimated run time.
+    """
+    targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+    axes = targets.shape[1]
+    validator = _Validator(
+        stage,
+        np.zeros(axes) if start is None else np.asarray(start, dtype=np.float64)[:axes],
+        (origin_offsets or [None] * axes)[:axes],
+        speed,
+        dwell_time,
+        overhead,
+    )
+    validator.feed(targets)
+    return validator.report()
+
+
+def validate_plan(
+    plan: ScanPlan,
+    stage: Stage | None,
+    speed: tuple[int, int, int],
+    start: np.ndarray,
+    origin_offsets: list[float | None],
+    mode: Literal["A", "M"] = "A",
+    dwell_time: float = 0.0,
+    overhead: float = 0.0,
+    chunk_size: int = 65536,
+) -> ValidationReport:
+    """Check a scan plan chunk by chunk without loading it into memory.
+
+    Parameters
+    ----------
+    plan : ScanPlan
+        Plan to check.
+    stage : Stage | None
+        Profile of the stage. When None, only the run time is estimated.
+    speed : tuple[int, int, int]
+        Start-up speed[μm/sec], maximum speed[μm/sec] and acceleration/deceleration
+        time[msec].
+    start : np.ndarray
+        Logical positions[μm] of all axes before the first move.
+    origin_offsets : list[float | None]
+        Position of the logical origin seen from the mechanical origin of each axis[μm].
+    mode : str, optional
+        When "A", rows are absolute positions. When "M", relative displacements,
+        by default "A".
+    dwell_time : float, optional
+        Stop time after each move[sec], by default 0.0.
+    overhead : float, optional
+        Communication and scheduling time of each move[sec], by default 0.0.
+    chunk_size : int, optional
+        Number of rows checked at once, by default 65536.
+
+    Returns
+    -------
+    ValidationReport
+        Violations, indexed by row, and the estimated run time.
+    """
+    start = np.asarray(start, dtype=np.float64)
+    axes = len(start)
+    validator = _Validator(stage, start, origin_offsets, speed, dwell_time, overhead)
+    position = start.copy()
+    for _, chunk in plan.iter_chunks(0, chunk_size):
+        targets = np.full((len(chunk), axes), np.nan)
+        columns = min(axes, chunk.shape[1])
+        targets[:, :columns] = chunk[:, :columns]
+        if mode == "M":
+            moving = ~np.isnan(targets)
+            targets = position + np.cumsum(np.nan_to_num(targets), axis=0)
+            position = targets[-1].copy()
+            targets[~moving] = np.nan
+        validator.feed(targets)
+    return validator.report()
+
+
+def step_program(distance: int, step_num: int) -> np.ndarray:
+    """Return the targets of `Step` from the position where it fixes the origin."""
+    moves = max(step_num - 1, 1)
+    return (distance * np.arange(1, moves + 1, dtype=np.float64))[:, np.newaxis]
+
+
+def cycle_program(distance: int, cycle_num: int) -> np.ndarray:
+    """Return the targets of `Cycle` from the position where it fixes the origin."""
+    moves = cycle_num * 2 + 1
+    return np.where(np.arange(moves) % 2 == 0, float(distance), 0.0)[:, np.newaxis]
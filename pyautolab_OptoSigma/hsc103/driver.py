@@ -1,32 +1,26 @@
 from typing import Literal
 
-from serial.serialutil import EIGHTBITS, PARITY_NONE, STOPBITS_ONE
-
-from pyautolab_OptoSigma.helper.driver import OSMS26, SGSP26, StageController
+from pyautolab_OptoSigma.helper import codec
+from pyautolab_OptoSigma.helper.driver import StageController
+from pyautolab_OptoSigma.helper.process import ProcessStageController
+from pyautolab_OptoSigma.helper.server import RemoteStageController
 
 
 class Hsc103(StageController):
-    # List of available stages
-    _STAGES = {"SGSP26": SGSP26, "OSMS26": OSMS26}
+    AXES = 3
+    CODEC = codec.HSC103
+    # `?:D<axis>` reads back the drive speed of the axis
+    CONFIGURATION_QUERIES = {
+        ("set_speed", b"D", 1): ("speed", 1),
+        ("set_speed", b"D", 2): ("speed", 2),
+        ("set_speed", b"D", 3): ("speed", 3),
+    }
+    CAN_ENCODE = True
+    SETTING_PREFIX = "hsc103"
 
     def __init__(self) -> None:
         super().__init__()
 
-    def open(self) -> None:
-        """Connect stage controller(Hsc103)."""
-        self._ser.port = self.port
-        self._ser.baudrate = 38400
-        self._ser.bytesize = EIGHTBITS
-        self._ser.stopbits = STOPBITS_ONE
-        self._ser.timeout = 1
-        self._ser.parity = PARITY_NONE
-        self._ser.rtscts = True
-        self._ser.open()
-
-    def close(self) -> None:
-        """Disconnect stage controller(Hsc103)."""
-        self._ser.close()
-
     def get_speed(self) -> list[list[float]]:
         """Get stages travel speed and acceleration/deceleration time.
 
@@ -40,10 +34,8 @@ class Hsc103(StageController):
         """
         speeds = []
         for i in range(1, 4):
-            speed_str = self._ser.send_query_message(f"?:D{i}").split(",")
-            speed_int = [round(int(elem), 2) for elem in speed_str[:2]]
-            speed_int.append(int(speed_str[-1]))
-            speeds.append(speed_int)
+            start, max, acceleration = self._query("speed", i)
+            speeds.append([round(start / 100, 2), round(max / 100, 2), acceleration])
         return speeds
 
     def measure_positions(self) -> list[float]:
@@ -55,8 +47,7 @@ class Hsc103(StageController):
             Current stages position[μm].
             Data format is [first axis, second axis, third axis].
         """
-        positions = self._ser.send_query_message("Q:").split(",")
-        return [round(int(position) / 100, 2) for position in positions]
+        return [round(position / 100, 2) for position in self._query("status")]
 
     def is_ready(self) -> list[bool]:
         """Check whether the controller is ready for operation or not.
@@ -66,8 +57,9 @@ class Hsc103(StageController):
         list[bool]
             Status of stages are ready or not.
         """
-        messages = self._ser.send_query_message("!:").split(",")
-        return [int(stage_status) == 0 for stage_status in messages]
+        ready = [stage_status == 0 for stage_status in self._query("ready")]
+        self._finish_homing(ready)
+        return ready
 
     def set_stage_speed(
         self,
@@ -94,11 +86,8 @@ class Hsc103(StageController):
             Mode of Deciding which setting you want to set the speed. When `D`, set
             normal stage speed. When `B`, set return original speed., by default `D`.
         """
-        pre_command = f"{mode}:"
-        command = pre_command + f"{axis},{min*100},{max*100},{acceleration_time}"
-        if original_reset_speed is not None:
-            command += f",{original_reset_speed * 100}"
-        self._ser.send_query_message(command)
+        origin_speed = None if original_reset_speed is None else original_reset_speed * 100
+        self._send("set_speed", mode.encode("ascii"), axis, min * 100, max * 100, acceleration_time, origin_speed)
 
     def fix_origin(self, axis: tuple[bool, bool, bool]) -> None:
         """Set electronic (logical) origin to current position of each axis.
@@ -108,9 +97,8 @@ class Hsc103(StageController):
         axis : list[bool], optional
             List that determines the axis to which the settings apply.
         """
-        # Convert bool to binary number(False -> 0 -> "0", True -> 1 -> "1")
-        converted = [str(int(elem)) for elem in axis]
-        self._ser.send_query_message("R:" + ",".join(converted))
+        self._shift_origin(axis)
+        self._send("fix_origin", *axis)
 
     def move_stages(
         self,
@@ -129,9 +117,31 @@ class Hsc103(StageController):
             Mode of stage drive. When "A", move absolute. When "M", move relative.
             , by default "A"
         """
-        displacement_str = [str(elem * 100) if elem is not None else "" for elem in displacements]
-        command = f"{mode}:" + ",".join(displacement_str)
-        self._ser.send_query_message(command)
+        self.send_encoded(self.encode_move(displacements, mode), retry=mode == "A")
+
+    def encode_move(
+        self,
+        displacements: tuple[int | None, int | None, int | None],
+        mode: Literal["A", "M"] = "A",
+    ) -> tuple[bytes, ...]:
+        """Build the command of `move_stages` without sending it.
+
+        Parameters
+        ----------
+        displacements :  tuple[Optional[int], Optional[int], Optional[int]]
+            Displacements of stages. The number of elements must always be 3.
+            Unit is [μm].
+        mode : str, optional
+            Mode of stage drive. When "A", move absolute. When "M", move relative.
+            , by default "A"
+
+        Returns
+        -------
+        tuple[bytes, ...]
+            Drive command.
+        """
+        values = [elem * 100 if elem is not None else None for elem in displacements]
+        return (self.CODEC.encode("move_absolute" if mode == "A" else "move_relative", *values),)
 
     def move_stage_to_mechanical_origin(self, axis: tuple[bool, bool, bool]) -> None:
         """Detect the mechanical origin for a stage and move the stage to the machine origin.
@@ -143,10 +153,8 @@ class Hsc103(StageController):
             List showing which axis to return to the return origin.
             The number of elements must always be 3.
         """
-        # Convert bool to binary number(False -> 0 -> "0", True -> 1 -> "1")
-        converted = [str(int(elem)) for elem in axis]
-        command = "H:" + ",".join(converted)
-        self._ser.send_query_message(command)
+        self._send("home", *axis)
+        self._start_homing(axis)
 
     def stop(self, axis: tuple[bool, bool]) -> None:
         """Decelerate and stop the stage.
@@ -157,14 +165,11 @@ class Hsc103(StageController):
             List showing which axis to stop.
             The number of elements must always be 3.
         """
-        # Convert bool to binary number(False -> 0 -> "0", True -> 1 -> "1")
-        axis_str = [str(int(elem)) for elem in axis]
-        command = "L:" + ",".join(axis_str)
-        self._ser.send_query_message(command)
+        self._send("stop", *axis)
 
     def emergency_stop(self) -> None:
         """Stops all stages immediately, whatever the conditions."""
-        self._ser.send_query_message("L:E")
+        self._send("emergency_stop")
 
     def jog(
         self,
@@ -182,6 +187,18 @@ class Hsc103(StageController):
                         Drive directions. When "+", move to plus.
                         When "-", move to minus.
         """
-        commands = [str(direction) if direction else "" for direction in directions]
-        command = "J:" + ",".join(commands)
-        self._ser.send_query_message(command)
+        self._send("jog", *(direction.encode("ascii") if direction else b"" for direction in directions))
+
+
+class Hsc103Process(ProcessStageController):
+    """Hsc103 running in a dedicated child process."""
+
+    def __init__(self) -> None:
+        super().__init__("pyautolab_OptoSigma.hsc103.driver:Hsc103")
+
+
+class Hsc103Remote(RemoteStageController):
+    """Hsc103 shared through a stage server, which is started on the port unless one is running."""
+
+    def __init__(self) -> None:
+        super().__init__(class_path="pyautolab_OptoSigma.hsc103.driver:Hsc103")
@@ -1,37 +1,26 @@
-import re
 from math import floor
 from typing import Any, Literal
 
-from serial.serialutil import EIGHTBITS, PARITY_NONE, STOPBITS_ONE
-
-from pyautolab_OptoSigma.helper.driver import OSMS26, SGSP26, Stage, StageController
+from pyautolab_OptoSigma.helper import codec
+from pyautolab_OptoSigma.helper.driver import OSMS26, SGSP26, StageController
+from pyautolab_OptoSigma.helper.process import ProcessStageController
+from pyautolab_OptoSigma.helper.server import RemoteStageController
 
 
 class Shot702(StageController):
     _STAGES = {"SGSP26": SGSP26, "OSMS26": OSMS26}
     PORT_FILTER = "ATEN"
+    AXES = 2
+    CODEC = codec.SHOT702
+    # `?:DW` reads back the drive speeds of both axes
+    CONFIGURATION_QUERIES = {("set_speed", b"D", 1): ("speed",), ("set_speed", b"D", 2): ("speed",)}
+    CAN_ENCODE = True
+    SETTING_PREFIX = "shot702"
 
     def __init__(self) -> None:
         super().__init__()
         # μm/pulse
         self._resolution = 0.0
-        self.stage: Stage | None = None
-
-    def open(self) -> None:
-        """Connect stage controller(Shot702)."""
-        self._ser.port = self.port
-        self._ser.baudrate = 38400
-        self._ser.bytesize = EIGHTBITS
-        self._ser.stopbits = STOPBITS_ONE
-        self._ser.timeout = 1
-        self._ser.parity = PARITY_NONE
-        self._ser.rtscts = True
-        self._ser.open()
-        self.initialize("OSMS26")
-
-    def close(self) -> None:
-        """Disconnect stage controller(Shot702)."""
-        self._ser.close()
 
     def initialize(self, stage: str) -> None:
         """Initialize stage controller(Shot702).
@@ -62,20 +51,8 @@ class Shot702(StageController):
         division : int
             Divisions of a stepping motor.
         """
-        self._ser.send_query_message(f"S:1{division}")
-        self._ser.send_query_message(f"S:2{division}")
-
-    def _get_status(self) -> list[str]:
-        """Get the coordinates for each axis and the current state of each stage.
-
-        Returns
-        -------
-        list[str]
-            The status of controller and stage. The first element is the first-axis
-            coordinates. The second element is the second-axis coordinates. The third
-            and subsequent ones represent the state of the controller.
-        """
-        return self._ser.send_query_message("Q:").split(",")
+        self._send("division", 1, division)
+        self._send("division", 2, division)
 
     def get_speed(self) -> list[list[int]]:
         """Get stages travel speed and acceleration/deceleration time.
@@ -86,15 +63,11 @@ class Shot702(StageController):
             Stages speed[μm/sec] and acceleration/deceleration time[msec].
             The first element is the first axis. The second element is  the second axis.
         """
-        speeds = self._ser.send_query_message("?:DW")
-        speeds = re.split("[SFR]", speeds)[1:]
-        speeds = [int(elem) for elem in speeds]
-        speed_1_pps, speed_2_pps = speeds[:3], speeds[3:]
-        speed_1_s = [self._pps_to_speed(elem) for elem in speed_1_pps[:2]]
-        speed_1_s.append(speed_1_pps[-1])
-        speed_2_s = [self._pps_to_speed(elem) for elem in speed_2_pps[:2]]
-        speed_2_s.append(speed_2_pps[-1])
-        return [speed_1_s, speed_2_s]
+        start_1, max_1, acceleration_1, start_2, max_2, acceleration_2 = self._query("speed")
+        return [
+            [self._pps_to_speed(start_1), self._pps_to_speed(max_1), acceleration_1],
+            [self._pps_to_speed(start_2), self._pps_to_speed(max_2), acceleration_2],
+        ]
 
     def measure_positions(self) -> list[float]:
         """Return the current position information of 2 stages axis.
@@ -105,8 +78,8 @@ class Shot702(StageController):
             Current stages position[μm].
             Data format is [first axis, second axis]
         """
-        positions = self._get_status()[:2]  # unit is [pulse]
-        return [round(int(position.replace(" ", "")) * self._resolution, 2) for position in positions]
+        position_1, position_2 = self._query("status")  # unit is [pulse]
+        return [round(position_1 * self._resolution, 2), round(position_2 * self._resolution, 2)]
 
     def is_ready(self) -> list[bool]:
         """Check whether the controller is ready for operation or not.
@@ -116,7 +89,9 @@ class Shot702(StageController):
         list[bool]
             Status of stage is ready.
         """
-        return [self._ser.send_query_message("!:") == "R"]
+        ready = [self._send("ready") == b"R"]
+        self._finish_homing(ready)
+        return ready
 
     def _pps_to_speed(self, pps: int) -> int:
         """Convert pps to speed.
@@ -148,6 +123,9 @@ class Shot702(StageController):
         """
         return floor(speed / self._resolution)
 
+    def position_tolerance(self) -> float:
+        return self._resolution
+
     def set_stage_speed(
         self,
         axis: Literal[1, 2],
@@ -173,17 +151,15 @@ class Shot702(StageController):
             Mode of Deciding which setting you want to set the speed. When `D`, set
             normal stage speed. When `V`, set return original speed., by default `V`
         """
-        command = f"{mode}:{axis}"
         min_pps = self._speed_to_pps(min)
         max_pps = self._speed_to_pps(max)
-        command += f"S{min_pps}F{max_pps}R{acceleration_time}"
-        self._ser.send_query_message(command)
+        self._send("set_speed", mode.encode("ascii"), axis, min_pps, max_pps, acceleration_time)
 
     def _drive_stage(self) -> None:
         """When a drive command is issued, the stage starts moving.
         The G command is used after M, A, and J commands.
         """
-        self._ser.send_query_message("G:")
+        self._send("drive")
 
     def fix_origin(self, axis: tuple[bool, bool]) -> None:
         """Set electronic (logical) origin to current position of each axis.
@@ -194,10 +170,10 @@ class Shot702(StageController):
             List that determines the axis to which the settings apply. The number of
             elements must always be 2.
         """
-        command = f"R:{self._get_axis_option(axis)}"
-        self._ser.send_query_message(command)
+        self._shift_origin(axis)
+        self._send("fix_origin", self._get_axis_option(axis))
 
-    def _get_axis_option(self, axis_data: tuple[Any, Any]) -> str:
+    def _get_axis_option(self, axis_data: tuple[Any, Any]) -> bytes:
         """Decide axis option
 
         Parameters
@@ -207,11 +183,12 @@ class Shot702(StageController):
 
         Returns
         -------
-        str
-            When only the first axis, return "1". When only the second axis, return "2".
-            When double axis, return "W".
+        bytes
+            When only the first axis, return b"1". When only the second axis, return b"2".
+            When double axis, return b"W".
         """
-        return "W" if all(axis_data) else ("1" if axis_data[0] is not None else "2")
+        selected = [data is not None and data is not False for data in axis_data[:2]]
+        return b"W" if all(selected) else (b"1" if selected[0] else b"2")
 
     def move_stages(
         self,
@@ -229,16 +206,32 @@ class Shot702(StageController):
             Mode of stage drive. When "A", move absolute. When "M", move relative.
             , by default "A".
         """
+        self.send_encoded(self.encode_move(displacements, mode), retry=mode == "A")
+
+    def encode_move(
+        self,
+        displacements: tuple[int | None, int | None],
+        mode: Literal["A", "M"] = "A",
+    ) -> tuple[bytes, ...]:
+        """Build the commands of `move_stages` without sending them.
+
+        Parameters
+        ----------
+        displacements : tuple[Optional[int], Optional[int]]
+            Displacements of stages. The number of elements must always be 2.
+        mode : str, optional
+            Mode of stage drive. When "A", move absolute. When "M", move relative.
+            , by default "A".
+
+        Returns
+        -------
+        tuple[bytes, ...]
+            Setting command followed by the drive command `G:`.
+        """
         axis = self._get_axis_option(displacements[:2])
-        command = f"{mode}:{axis}"
-        for displacement in displacements[:2]:
-            if displacement is None:
-                continue
-            direction = "-" if displacement < 0 else "+"
-            pulse = floor(displacement / self._resolution)
-            command += f"{direction}P{abs(pulse)}"
-        self._ser.send_query_message(command)
-        self._drive_stage()
+        pulses = [floor(value / self._resolution) for value in displacements[:2] if value is not None]
+        command = "move_absolute" if mode == "A" else "move_relative"
+        return (self.CODEC.encode(command, axis, *pulses), self.CODEC.encode("drive"))
 
     def move_stage_to_mechanical_origin(self, axis: tuple[bool, bool]) -> None:
         """Detect the mechanical origin for a stage and move the stage to the machine origin.
@@ -250,7 +243,8 @@ class Shot702(StageController):
             List showing which stage to return to the return origin.
             The number of elements must always be 2.
         """
-        self._ser.send_query_message(f"H:{self._get_axis_option(axis[:2])}")
+        self._send("home", self._get_axis_option(axis[:2]))
+        self._start_homing(axis)
 
     def stop(self, axis: tuple[bool, bool]) -> None:
         """Decelerate and stop the stage.
@@ -261,11 +255,11 @@ class Shot702(StageController):
             List showing which axis to stop.
             The number of elements must always be 2.
         """
-        self._ser.send_query_message(f"L:{self._get_axis_option(axis[:2])}")
+        self._send("stop", self._get_axis_option(axis[:2]))
 
     def emergency_stop(self) -> None:
         """Stops all stages immediately, whatever the conditions."""
-        self._ser.send_query_message("L:E")
+        self._send("emergency_stop")
 
     def jog(
         self,
@@ -278,7 +272,20 @@ class Shot702(StageController):
         direction : tuple[str], optional
             Drive directions. When "+", move to plus. When "-", move to minus.
         """
-        commands = [str(direction) for direction in directions if direction]
-        command = f"J:{self._get_axis_option(directions[:2])}{''.join(commands)}"
-        self._ser.send_query_message(command)
+        signs = [direction.encode("ascii") for direction in directions[:2] if direction]
+        self._send("jog", self._get_axis_option(directions[:2]), *signs)
         self._drive_stage()
+
+
+class Shot702Process(ProcessStageController):
+    """Shot702 running in a dedicated child process."""
+
+    def __init__(self) -> None:
+        super().__init__("pyautolab_OptoSigma.shot702.driver:Shot702")
+
+
+class Shot702Remote(RemoteStageController):
+    """Shot702 shared through a stage server, which is started on the port unless one is running."""
+
+    def __init__(self) -> None:
+        super().__init__(class_path="pyautolab_OptoSigma.shot702.driver:Shot702")
@@ -1,7 +1,7 @@
 from pyautolab import api
 
 from pyautolab_OptoSigma.helper.driver import PARAMETER
-from pyautolab_OptoSigma.helper.tab import Cycle, Step, TabUI
+from pyautolab_OptoSigma.helper.tab import TabUI, build_controller
 from pyautolab_OptoSigma.shot702.driver import Shot702
 from pyautolab_OptoSigma.widget import StageControlManager
 
@@ -24,14 +24,9 @@ class TabShot702(api.DeviceTab):
             axis=1, min=speed, max=speed, acceleration_time=acceleration_time, original_reset_speed=None
         )
 
+    @api.qt.popup_exception(ValueError)
     def get_controller(self) -> api.Controller | None:
-        stop_time = self._ui.spinbox_stop_interval.value()
-        operation_num = self._ui.spinbox_operation_num.value()
-        distance = self._ui.spinbox_distance.value()
-        judge_ready_interval = int(api.get_setting("shot702.judgeReadyInterval"))
-
-        controller_type = Cycle if self._ui.p_btn_cycle_mode.isChecked() else Step
-        return controller_type(self.device, stop_time, operation_num, distance, judge_ready_interval)
+        return build_controller(self.device, self._ui, "shot702")
 
     def get_parameters(self) -> dict[str, str]:
         return PARAMETER
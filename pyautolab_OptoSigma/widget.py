@@ -1,11 +1,36 @@
+import time
+
 import qtawesome as qta
 from pyautolab import api
 from qtpy.QtCore import QSize, Qt, Slot  # type: ignore
-from qtpy.QtWidgets import QGridLayout, QGroupBox, QLabel, QSizePolicy, QVBoxLayout
+from qtpy.QtGui import QKeyEvent, QShowEvent, QWheelEvent
+from qtpy.QtWidgets import (
+    QApplication,
+    QCheckBox,
+    QComboBox,
+    QFormLayout,
+    QGridLayout,
+    QGroupBox,
+    QLabel,
+    QSizePolicy,
+    QVBoxLayout,
+)
 from serial.serialutil import SerialException
 
 from pyautolab_OptoSigma.helper.driver import StageController
 
+# Jog speeds selected with the mouse wheel[μm/sec]
+JOG_SPEEDS = (10, 50, 100, 500, 1000, 5000, 10000, 50000)
+# Jog speed is multiplied by FAST_FACTOR while Shift is held and by FINE_FACTOR while Ctrl is held
+FAST_FACTOR = 10
+FINE_FACTOR = 0.1
+# Interval of the position polling while jogging and while the stage stops[msec]
+JOG_POLL_INTERVAL = 100
+# Hold time after which the ramp raises the jog speed to the next level[msec]
+RAMP_INTERVAL = 1000
+# The drivers take a flag or a direction for each of up to 3 axes
+_AXIS_SLOTS = 3
+
 
 class StageControlManager(api.widgets.Manager):
     def __init__(self, device: StageController):
@@ -42,12 +67,32 @@ class StageControlManager(api.widgets.Manager):
         self._p_button_set_speed = api.qt.push_button(
             clicked=self.set_stage_speed, fixed_width=100, text="Set"
         )
+        self._combo_axis = QComboBox()
+        self._label_jog_speed = QLabel()
+        self._check_ramp = QCheckBox("Ramp up while held")
+        self._label_latency = QLabel("-")
 
         # timer
         self.timer_measure_position = api.qt.timer(parent=self, timeout=self.measure_position)
+        self._timer_ramp = api.qt.timer(parent=self, timeout=self._ramp_jog)
+
+        # jog state
+        self._jog_level = JOG_SPEEDS.index(1000)
+        self._base_jog_level = self._jog_level
+        # (axis, speed[μm/sec]) last set for jogging, so that pressing only sends the jog
+        self._applied_jog_speed: tuple[int, int] | None = None
+        self._jog_direction: str | None = None
+        # Whether the jog is held back until `measure_position` sees the stage ready and
+        # sets the jog speed, which the controller rejects while driving
+        self._jog_pending = False
+        # Time from the press to the acknowledged jog and from the release to the acknowledged stop[sec]
+        self._press_latency: float | None = None
+        self._release_latency: float | None = None
 
         # setup
         self._int_slider.range = (1, 50000)
+        self._combo_axis.addItems([f"Axis {axis}" for axis in range(1, self._device.AXES + 1)])
+        self._combo_axis.currentIndexChanged.connect(self._change_axis)
 
         # setup layout
         group_control = QGroupBox("Control")
@@ -68,58 +113,213 @@ class StageControlManager(api.widgets.Manager):
         group_speed = QGroupBox("Speed Setting")
         group_speed.setLayout(v_layout_speed)
 
+        f_layout_jog = QFormLayout()
+        f_layout_jog.addRow("Axis: ", self._combo_axis)
+        f_layout_jog.addRow("Speed (wheel, Shift, Ctrl): ", self._label_jog_speed)
+        f_layout_jog.addRow("", self._check_ramp)
+        f_layout_jog.addRow("Latency: ", self._label_latency)
+        group_jog = QGroupBox("Jog")
+        group_jog.setLayout(f_layout_jog)
+
         g_layout = QGridLayout(self)
         g_layout.addWidget(group_control, 1, 1, 2, 1)
         g_layout.addWidget(group_position, 1, 2)
         g_layout.addWidget(group_origin, 2, 2)
         g_layout.addWidget(group_speed, 3, 1, 1, 2)
+        g_layout.addWidget(group_jog, 4, 1, 1, 2)
+
+    def showEvent(self, event: QShowEvent) -> None:
+        super().showEvent(event)
+        self._update_jog_speed()
+
+    def keyPressEvent(self, event: QKeyEvent) -> None:
+        if event.key() in (Qt.Key.Key_Shift, Qt.Key.Key_Control):
+            self._update_jog_speed()
+        super().keyPressEvent(event)
+
+    def keyReleaseEvent(self, event: QKeyEvent) -> None:
+        if event.key() in (Qt.Key.Key_Shift, Qt.Key.Key_Control):
+            self._update_jog_speed()
+        super().keyReleaseEvent(event)
+
+    def wheelEvent(self, event: QWheelEvent) -> None:
+        # Horizontal wheels and some touchpads only report x
+        delta = event.angleDelta().y() or event.angleDelta().x()
+        if delta == 0:
+            event.ignore()
+            return
+        step = 1 if delta > 0 else -1
+        self._jog_level = min(max(self._jog_level + step, 0), len(JOG_SPEEDS) - 1)
+        self._update_jog_speed()
+        event.accept()
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def up_stage(self) -> None:
-        self._device.jog(("+", None, None))
-        self.timer_measure_position.start(60)
+        self._start_jog("+")
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def down_stage(self) -> None:
-        self._device.jog(("-", None, None))
-        self.timer_measure_position.start(60)
+        self._start_jog("-")
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def stop_stage(self) -> None:
-        self._device.stop((True, False, False))
+        # Nothing is queried before the stop, so it goes out right after the release
+        released_at = time.perf_counter()
         self.timer_measure_position.stop()
+        self._timer_ramp.stop()
+        self._device.stop(self._axis_flags())
+        self._release_latency = time.perf_counter() - released_at
+        self._jog_direction = None
+        self._jog_pending = False
+        self._show_latency()
+        # Follow the deceleration until the stage is ready
+        self.timer_measure_position.start(JOG_POLL_INTERVAL)
+        if self._jog_level != self._base_jog_level:
+            # Set by `measure_position` once the stage stopped
+            self._jog_level = self._base_jog_level
+            self._apply_jog_speed()
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def emergency_stop(self) -> None:
         self._device.emergency_stop()
         self.timer_measure_position.stop()
+        self._timer_ramp.stop()
+        self._jog_direction = None
+        self._jog_pending = False
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def move_to_machine_zero(self) -> None:
-        self._device.move_stage_to_mechanical_origin((True, False, False))
+        # Homing runs only when the mechanical origin is unknown. Otherwise it is a plain move.
+        if not self._device.ensure_mechanical_origin(self._axis_flags()):
+            axis = self._combo_axis.currentIndex()
+            offset = self._device.origin_offsets[axis]
+            self._device.move_stages(tuple(round(-offset) if i == axis else None for i in range(_AXIS_SLOTS)))
         self.timer_measure_position.start(60)
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def fix_zero(self) -> None:
-        self._device.fix_origin((True, False, False))
-        self._lcd_position.setText(str(self._device.measure_positions()[0]))
+        self._device.fix_origin(self._axis_flags())
+        self._lcd_position.setText(str(self._device.measure_positions()[self._combo_axis.currentIndex()]))
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def set_stage_speed(self) -> None:
+        axis = self._combo_axis.currentIndex() + 1
         max_speed = self._int_slider.current_value
-        self._device.set_stage_speed(1, max_speed, max_speed, 100, None, mode="D")
-        self._device.set_stage_speed(1, max_speed, max_speed, 100, max_speed, mode="B")
+        self._device.set_stage_speed(axis, max_speed, max_speed, 100, None, mode="D")
+        self._device.set_stage_speed(axis, max_speed, max_speed, 100, max_speed, mode="B")
+        # The jog speed is set again before the next press
+        self._applied_jog_speed = None
+        self._update_jog_speed()
 
     @Slot()
     @api.qt.popup_exception(SerialException)
     def measure_position(self) -> None:
-        self._lcd_position.setText(str(self._device.measure_positions()[0]))
-        if self._device.is_ready():
+        self._lcd_position.setText(str(self._device.measure_positions()[self._combo_axis.currentIndex()]))
+        # While jogging, only the position is polled to keep the serial line free for the stop
+        if self._jog_direction is not None and not self._jog_pending:
+            return
+        if not all(self._device.is_ready()):
+            return
+        axis = self._combo_axis.currentIndex() + 1
+        speed = self._jog_speed()
+        if self._applied_jog_speed != (axis, speed):
+            self._set_jog_speed(axis, speed)
+        if self._jog_pending:
+            self._jog_pending = False
+            self._device.jog(self._jog_directions())
+        else:
             self.timer_measure_position.stop()
+
+    @Slot()
+    @api.qt.popup_exception(SerialException)
+    def _update_jog_speed(self) -> None:
+        self._apply_jog_speed()
+
+    @Slot()
+    @api.qt.popup_exception(SerialException)
+    def _change_axis(self) -> None:
+        self._apply_jog_speed()
+        self._lcd_position.setText(str(self._device.measure_positions()[self._combo_axis.currentIndex()]))
+
+    @Slot()
+    @api.qt.popup_exception(SerialException)
+    def _ramp_jog(self) -> None:
+        if self._jog_level < len(JOG_SPEEDS) - 1:
+            self._jog_level += 1
+            self._apply_jog_speed()
+
+    def _start_jog(self, direction: str) -> None:
+        # The speed was set beforehand and no poll runs, so only the jog is sent
+        pressed_at = time.perf_counter()
+        self.timer_measure_position.stop()
+        self._jog_direction = direction
+        self._base_jog_level = self._jog_level
+        if self._applied_jog_speed == (self._combo_axis.currentIndex() + 1, self._jog_speed()):
+            self._device.jog(self._jog_directions())
+            self._press_latency = time.perf_counter() - pressed_at
+            self._show_latency()
+        else:
+            # The stage is still stopping from the last jog and its speed is not set yet
+            self._jog_pending = True
+        self.timer_measure_position.start(JOG_POLL_INTERVAL)
+        if self._check_ramp.isChecked():
+            self._timer_ramp.start(RAMP_INTERVAL)
+
+    def _apply_jog_speed(self) -> None:
+        """Set the jog speed of the selected axis unless it is already set.
+        The controller rejects speed settings while driving, so a running jog is
+        stopped, and `measure_position` sets the speed and starts the jog again once
+        the stage is ready. The same applies while the stage is still stopping.
+        """
+        axis = self._combo_axis.currentIndex() + 1
+        speed = self._jog_speed()
+        self._label_jog_speed.setText(f"{speed} μm/sec")
+        if self._applied_jog_speed == (axis, speed):
+            return
+        if self._jog_direction is not None:
+            if not self._jog_pending:
+                self._device.stop(self._axis_flags())
+                self._jog_pending = True
+            return
+        if self.timer_measure_position.isActive():
+            return
+        self._set_jog_speed(axis, speed)
+
+    def _set_jog_speed(self, axis: int, speed: int) -> None:
+        # Jog drives at the start-up speed
+        self._device.set_stage_speed(axis, speed, speed, 100, None, mode="D")
+        self._applied_jog_speed = (axis, speed)
+
+    def _jog_speed(self) -> int:
+        """Return the jog speed[μm/sec] from the wheel level and the held modifier keys."""
+        speed = float(JOG_SPEEDS[self._jog_level])
+        modifiers = QApplication.queryKeyboardModifiers()
+        if modifiers & Qt.KeyboardModifier.ShiftModifier:
+            speed *= FAST_FACTOR
+        elif modifiers & Qt.KeyboardModifier.ControlModifier:
+            speed *= FINE_FACTOR
+        max_speed = 50000 if self._device.stage is None else self._device.stage.max_speed * 1000
+        return int(min(max(speed, 1), max_speed))
+
+    def _axis_flags(self) -> tuple[bool, ...]:
+        axis = self._combo_axis.currentIndex()
+        return tuple(i == axis for i in range(_AXIS_SLOTS))
+
+    def _jog_directions(self) -> tuple[str | None, ...]:
+        axis = self._combo_axis.currentIndex()
+        return tuple(self._jog_direction if i == axis else None for i in range(_AXIS_SLOTS))
+
+    def _show_latency(self) -> None:
+        texts = []
+        if self._press_latency is not None:
+            texts.append(f"press → motion {self._press_latency * 1000:.1f} msec")
+        if self._release_latency is not None:
+            texts.append(f"release → stop {self._release_latency * 1000:.1f} msec")
+        self._label_latency.setText(", ".join(texts))
@@ -0,0 +1,40 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """Persist the state of the drivers, e.g. the origins, in the temporary directory of the test."""
+    monkeypatch.setattr("pyautolab_OptoSigma.helper.storage.STATE_DIR", tmp_path)
+    return tmp_path
+
+
+def connect(driver, time_scale: float = 1e6, speed=(500, 4000, 100), axes=(1,), serial=None):
+    """Return a driver connected to a simulated controller with the OSMS26 profile and the speed set.
+
+    Parameters
+    ----------
+    driver : type[StageController]
+        Driver class.
+    time_scale : float, optional
+        Speed of the simulated time, by default 1e6.
+    speed : tuple[int, int, int], optional
+        Start-up speed, maximum speed[μm/sec] and acceleration time[msec] of `axes`.
+    axes : tuple[int, ...], optional
+        Axes whose speed is set, by default (1,).
+    serial : SimulatedSerial | None, optional
+        Simulator to use instead of a new one.
+    """
+    # The simulator needs pyserial, which the test modules skip on
+    from pyautolab_OptoSigma.helper.simulator import simulate
+
+    device = driver()
+    if serial is None:
+        simulate(device, time_scale=time_scale)
+    else:
+        device._ser = serial
+    device._ser.port = "loopback"
+    device._ser.open()
+    device.initialize("OSMS26")
+    for axis in axes:
+        device.set_stage_speed(axis, *speed, None)
+    return device
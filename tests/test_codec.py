@@ -0,0 +1,60 @@
+import pytest
+
+from pyautolab_OptoSigma.helper import codec
+
+
+@pytest.mark.parametrize(
+    ("reply", "expected"),
+    [
+        (b"         0,         0,K,K,R", [0, 0]),
+        (b"      1000,       250,K,K,B", [1000, 250]),
+        # Shot702 pads between the sign and the digits
+        (b"-     1000,         0,K,K,R", [-1000, 0]),
+        (b"-         5,-   123456,K,K,R", [-5, -123456]),
+    ],
+)
+def test_shot702_status(reply: bytes, expected: list[int]) -> None:
+    assert codec.SHOT702.parsers()["status"](reply) == expected
+
+
+def test_shot702_speed() -> None:
+    assert codec.SHOT702.parsers()["speed"](b"S500F5000R200S600F6000R300") == [500, 5000, 200, 600, 6000, 300]
+
+
+@pytest.mark.parametrize(
+    ("name", "reply", "expected"),
+    [
+        ("status", b"123400,-5000,7", [123400, -5000, 7]),
+        ("ready", b"0,1,0", [0, 1, 0]),
+        ("speed", b"50000,500000,200", [50000, 500000, 200]),
+    ],
+)
+def test_hsc103_replies(name: str, reply: bytes, expected: list[int]) -> None:
+    assert codec.HSC103.parsers()[name](reply) == expected
+
+
+def test_short_reply() -> None:
+    with pytest.raises(ValueError):
+        codec.HSC103.parsers()["status"](b"123400,-5000")
+
+
+def test_parsers_do_not_share_buffers() -> None:
+    first, second = codec.HSC103.parsers()["status"], codec.HSC103.parsers()["status"]
+    result = first(b"100,200,300")
+    second(b"-1,-2,-3")
+    assert result == [100, 200, 300]
+
+
+@pytest.mark.parametrize(
+    ("model", "name", "args", "expected"),
+    [
+        (codec.SHOT702, "status", (), b"Q:\r\n"),
+        (codec.SHOT702, "move_absolute", (b"W", 1000, -2500), b"A:W+P1000-P2500\r\n"),
+        (codec.SHOT702, "set_speed", (b"D", 1, 5000, 50000, 100), b"D:1S5000F50000R100\r\n"),
+        (codec.HSC103, "move_relative", (10000, None, -3), b"M:10000,,-3\r\n"),
+        (codec.HSC103, "set_speed", (b"B", 1, 50000, 500000, 100, 400000), b"B:1,50000,500000,100,400000\r\n"),
+        (codec.HSC103, "stop", (True, False, False), b"L:1,0,0\r\n"),
+    ],
+)
+def test_encode(model: codec.Codec, name: str, args: tuple, expected: bytes) -> None:
+    assert model.encode(name, *args) == expected
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pyautolab")
+pytest.importorskip("serial")
+
+from pyautolab_OptoSigma.helper import discovery  # noqa: E402
+from pyautolab_OptoSigma.helper.discovery import HSC103, SHOT702, identify_reply  # noqa: E402
+from pyautolab_OptoSigma.helper.storage import load_state  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "reply, model",
+    [
+        ("         0,         0,K,K,R", SHOT702),
+        ("-     1000,         0,K,K,R", SHOT702),
+        ("      1000,-    67890,L,K,B", SHOT702),
+        ("0,0,0", HSC103),
+        ("-100000,2500,0", HSC103),
+        ("OK", None),
+        ("-     1000,         0", None),
+        ("1 000,0,0", None),
+    ],
+)
+def test_identify_reply(reply, model) -> None:
+    assert identify_reply(reply) == model
+
+
+@pytest.fixture
+def ports(monkeypatch):
+    """Probe result of each port of adapters whose serial number is the port name."""
+    results: dict[str, str | None] = {}
+
+    def comports() -> list[SimpleNamespace]:
+        return [SimpleNamespace(device=port, description="ATEN", serial_number=port) for port in results]
+
+    monkeypatch.setattr(discovery.list_ports, "comports", comports)
+    monkeypatch.setattr(discovery, "_probe", lambda port, timeout: results[port])
+    return results
+
+
+def test_cached_ports_are_probed_again(ports) -> None:
+    ports.update({"COM3": SHOT702, "COM4": HSC103})
+    assert discovery.discover_controllers() == {"COM3": SHOT702, "COM4": HSC103}
+    # Controllers swapped between the adapters, and the one of COM4 was unplugged
+    ports.update({"COM3": HSC103, "COM4": None})
+    assert discovery.discover_controllers() == {"COM3": HSC103}
+    assert load_state(discovery.DISCOVERY_STATE) == {"COM3": HSC103}
+
+
+def test_busy_port_keeps_its_cached_model(ports) -> None:
+    ports["COM3"] = SHOT702
+    discovery.discover_controllers()
+    ports["COM3"] = discovery._BUSY
+    assert discovery.discover_controllers() == {"COM3": SHOT702}
+    assert discovery.discover_controllers(use_cache=False) == {}
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("pyautolab")
+pytest.importorskip("serial")
+
+from pyautolab_OptoSigma.helper.flyscan import fly_scan  # noqa: E402
+from conftest import connect as connect_simulated  # noqa: E402
+from pyautolab_OptoSigma.hsc103.driver import Hsc103  # noqa: E402
+from pyautolab_OptoSigma.shot702.driver import Shot702  # noqa: E402
+
+
+def connect(driver):
+    return connect_simulated(driver, time_scale=100)
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+@pytest.mark.parametrize("use_jog", [False, True])
+def test_speed_is_restored(driver, use_jog) -> None:
+    device = connect(driver)
+    speed = device.get_speed()
+    result = fly_scan(device, 1, 1000, 2000, 100, use_jog=use_jog, timeout=5.0)
+    assert result.positions[-1] >= 1000 - device.position_tolerance()
+    assert device.get_speed() == speed
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_scan_ends_when_the_stage_stops(driver, monkeypatch) -> None:
+    device = connect(driver)
+    # Never within the tolerance of the target, so only the ready state ends the scan
+    monkeypatch.setattr(device, "position_tolerance", lambda: -1.0)
+    result = fly_scan(device, 1, 1000, 2000, 100, timeout=5.0)
+    assert result.positions[-1] == 1000
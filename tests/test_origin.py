@@ -0,0 +1,105 @@
+import pytest
+
+pytest.importorskip("pyautolab")
+pytest.importorskip("serial")
+
+from pyautolab_OptoSigma.helper.simulator import SimulatedSerial, simulate  # noqa: E402
+from pyautolab_OptoSigma.hsc103.driver import Hsc103  # noqa: E402
+from pyautolab_OptoSigma.shot702.driver import Shot702  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def connect(driver, serial=None):
+    device = driver()
+    device.port = "loopback"
+    if serial is None:
+        simulate(device, time_scale=1e6)
+    else:
+        device._ser = serial
+    device.open()
+    return device
+
+
+def wait(device) -> None:
+    while not all(device.is_ready()):
+        pass
+
+
+def away_from_origin(driver, clock: FakeClock):
+    device = connect(driver, SimulatedSerial(driver.__name__, clock=clock))
+    device.move_stages((1000, None, None))
+    clock.now += 100.0
+    assert all(device.is_ready())
+    return device
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_homing_is_recorded_once_finished(driver) -> None:
+    clock = FakeClock()
+    device = away_from_origin(driver, clock)
+    device.move_stage_to_mechanical_origin((True, False, False))
+    assert not all(device.is_ready())
+    assert not device.is_homed(1)
+    clock.now += 100.0
+    assert all(device.is_ready())
+    assert device.origin_offsets[0] == 0.0
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_stopped_homing_stays_unhomed(driver) -> None:
+    clock = FakeClock()
+    device = away_from_origin(driver, clock)
+    device.move_stage_to_mechanical_origin((True, False, False))
+    device.stop((True, False, False))
+    clock.now += 100.0
+    assert all(device.is_ready())
+    assert not device.is_homed(1)
+    assert device.ensure_mechanical_origin((True, False, False))
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_origin_is_restored_after_restart(driver) -> None:
+    device = connect(driver)
+    device.move_stage_to_mechanical_origin((True, False, False))
+    wait(device)
+    device.move_stages((300, None, None))
+    wait(device)
+    device.fix_origin((True, False, False))
+    device.move_stages((100, None, None))
+    wait(device)
+    device.close()
+    # The controller kept its positions while the software restarted
+    restarted = connect(driver, device._ser)
+    assert restarted.origin_offsets[0] == 300.0
+    assert restarted.measure_positions()[0] == 100
+    assert not restarted.ensure_mechanical_origin((True, False, False))
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_power_cycled_controller_is_not_restored(driver) -> None:
+    device = connect(driver)
+    device.move_stage_to_mechanical_origin((True, False, False))
+    wait(device)
+    device.move_stages((300, None, None))
+    wait(device)
+    device.close()
+    # A new simulator reports zero like a power-cycled controller
+    restarted = connect(driver)
+    assert not restarted.is_homed(1)
+
+
+def test_origin_is_not_saved_before_homing() -> None:
+    device = connect(Hsc103)
+    device.move_stages((300, None, None))
+    wait(device)
+    device.close()
+    restarted = connect(Hsc103, device._ser)
+    assert not restarted.restore_origin()
+    assert restarted.origin_offsets == [None] * Hsc103.AXES
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyautolab")
+pytest.importorskip("serial")
+
+from pyautolab_OptoSigma.helper.plan import PlanRunner, ScanPlan  # noqa: E402
+from conftest import connect as connect_simulated  # noqa: E402
+from pyautolab_OptoSigma.hsc103.driver import Hsc103  # noqa: E402
+from pyautolab_OptoSigma.shot702.driver import Shot702  # noqa: E402
+
+
+@pytest.fixture
+def plan(tmp_path):
+    path = tmp_path / "plan.npy"
+    np.save(path, np.array([[100.0, np.nan], [200.0, 50.0], [0.0, 0.0]]))
+    return ScanPlan(path)
+
+
+def connect(driver, time_scale: float = 1e6):
+    return connect_simulated(driver, time_scale=time_scale, axes=(1, 2))
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_plan_runs_encoded_moves(driver, plan, monkeypatch) -> None:
+    device = connect(driver)
+    monkeypatch.setattr(device, "move_stages", None)
+    assert PlanRunner(device, plan, poll_interval=0.0).run() == 3
+    assert device.measure_positions()[:2] == [0, 0]
+
+
+def test_plan_times_out(plan) -> None:
+    device = connect(Shot702, time_scale=1.0)
+    runner = PlanRunner(device, plan, poll_interval=0.0, timeout=0.01)
+    with pytest.raises(TimeoutError):
+        runner.run()
+    assert runner.row == 0
+    assert all(device.is_ready())
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("100,5\n\n", [[100.0, 5.0]]),
+        ("100,5\n\n200,6\n", [[100.0, 5.0], [200.0, 6.0]]),
+        ("\n100,5\n   \n200,\n\n\n", [[100.0, 5.0], [200.0, np.nan]]),
+        ("100\n\n5", [[100.0], [5.0]]),
+    ],
+)
+def test_csv_blank_lines_are_not_rows(tmp_path, text, expected) -> None:
+    path = tmp_path / "plan.csv"
+    path.write_text(text)
+    plan = ScanPlan(path)
+    assert plan.rows == len(expected)
+    rows = np.concatenate([chunk for _, chunk in plan.iter_chunks(chunk_size=1)])
+    np.testing.assert_array_equal(rows, expected)
+
+
+def test_csv_resume_skips_blank_lines(tmp_path) -> None:
+    path = tmp_path / "plan.csv"
+    path.write_text("x,y\n\n1,1\n\n2,2\n3,3\n\n")
+    plan = ScanPlan(path, header=True)
+    assert plan.rows == 3
+    chunks = list(plan.iter_chunks(start_row=1, chunk_size=1))
+    assert [first for first, _ in chunks] == [1, 2]
+    np.testing.assert_array_equal(np.concatenate([chunk for _, chunk in chunks]), [[2.0, 2.0], [3.0, 3.0]])
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyautolab")
+pytest.importorskip("serial")
+pytest.importorskip("qtawesome")
+
+from pyautolab_OptoSigma.helper.server import RemoteStageController, StageServer  # noqa: E402
+from pyautolab_OptoSigma.helper.simulator import simulate  # noqa: E402
+from pyautolab_OptoSigma.helper.profiler import PROFILER  # noqa: E402
+from pyautolab_OptoSigma.helper.tab import Cycle, Step, build_controller, preflight  # noqa: E402
+from pyautolab_OptoSigma.hsc103.driver import Hsc103  # noqa: E402
+
+SPEED = (500, 4000, 100)
+
+
+class Value:
+    """Stand-in for the spin boxes, slider and mode button of `TabUI`."""
+
+    def __init__(self, value) -> None:
+        self.current_value = value
+
+    def value(self):
+        return self.current_value
+
+    def isChecked(self) -> bool:
+        return self.current_value
+
+
+@pytest.fixture
+def hsc103():
+    device = Hsc103()
+    device.port = "loopback"
+    simulate(device, time_scale=1e6)
+    device.open()
+    yield device
+    device.close()
+
+
+def test_hsc103_has_a_stage_profile(hsc103):
+    assert hsc103.stage is not None
+    with pytest.raises(ValueError, match="travel range"):
+        preflight(hsc103, np.array([[hsc103.stage.travel_max * 2.0, 0.0, 0.0]]), SPEED, 0.0)
+
+
+def test_unknown_stage_is_refused(hsc103):
+    hsc103.stage = None
+    with pytest.raises(ValueError, match="stage profile is unknown"):
+        preflight(hsc103, np.array([[100.0, 0.0, 0.0]]), SPEED, 0.0)
+
+
+def test_remote_mirrors_stage_and_origins(hsc103):
+    server = StageServer(hsc103, poll_interval=0.01)
+    server.start()
+    remote = RemoteStageController(server.address)
+    remote.open()
+    try:
+        assert remote.stage == hsc103.stage
+        assert not remote.is_homed(1)
+        remote.move_stage_to_mechanical_origin((True, False, False))
+        # The origin is recorded by the poll which sees the stage ready
+        assert all(remote.is_ready())
+        assert remote.is_homed(1)
+        assert remote.origin_offsets == hsc103.origin_offsets
+    finally:
+        remote.close()
+        server.close()
+
+
+@pytest.mark.parametrize(("is_cycle", "controller_type"), [(False, Step), (True, Cycle)])
+def test_controller_is_built_from_the_model_settings(hsc103, tmp_path, monkeypatch, is_cycle, controller_type):
+    settings = {
+        "hsc103.judgeReadyInterval": 20,
+        "hsc103.accelerationAndDecelerationTime": 100,
+        "hsc103.timingReportDirectory": str(tmp_path),
+        "hsc103.profileRuns": True,
+    }
+    monkeypatch.setattr("pyautolab.api.get_setting", settings.get)
+    ui = SimpleNamespace(
+        spinbox_stop_interval=Value(100),
+        spinbox_operation_num=Value(3),
+        spinbox_distance=Value(1000),
+        slider_speed=Value(1000),
+        p_btn_cycle_mode=Value(is_cycle),
+    )
+    try:
+        controller = build_controller(hsc103, ui, "hsc103")
+        assert isinstance(controller, controller_type)
+        assert controller.preflight is not None
+        assert controller.timing_directory == tmp_path
+        assert PROFILER.enabled
+        ui.spinbox_distance = Value(hsc103.stage.travel_max * 2)
+        with pytest.raises(ValueError, match="travel range"):
+            build_controller(hsc103, ui, "hsc103")
+    finally:
+        PROFILER.disable()
@@ -0,0 +1,76 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyautolab")
+serialutil = pytest.importorskip("serial.serialutil")
+
+from pyautolab_OptoSigma.helper import storage  # noqa: E402
+from pyautolab_OptoSigma.helper.process import ProcessStageController  # noqa: E402
+from pyautolab_OptoSigma.helper.simulator import simulate  # noqa: E402
+from pyautolab_OptoSigma.shot702.driver import Shot702  # noqa: E402
+
+
+class FlakyShot702(Shot702):
+    """Simulated Shot702 whose port is a directory holding its state and failure flags."""
+
+    def open(self) -> None:
+        storage.STATE_DIR = Path(self.port)
+        simulate(self, time_scale=1e6)
+        super().open()
+
+    def measure_positions(self) -> list[float]:
+        if (storage.STATE_DIR / "garbled").exists():
+            raise ValueError("garbled reply")
+        return super().measure_positions()
+
+    def get_speed(self) -> list[list[float]]:
+        if (storage.STATE_DIR / "crash").exists():
+            os._exit(3)
+        return super().get_speed()
+
+
+@pytest.fixture
+def device(tmp_path):
+    device = ProcessStageController(f"{__name__}:FlakyShot702", poll_interval=0.01, timeout=10.0)
+    device.port = str(tmp_path)
+    device.open()
+    yield device
+    device.close()
+
+
+def wait_for(condition) -> None:
+    deadline = time.monotonic() + 5.0
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_failed_polls_are_counted(device, tmp_path):
+    (tmp_path / "garbled").touch()
+    wait_for(lambda: device.poll_errors >= 2)
+    (tmp_path / "garbled").unlink()
+    assert device.is_alive
+    device.move_stages((100, None), "A")
+    wait_for(lambda: device.measure_positions()[0] == 100)
+
+
+def test_stage_and_origins_are_forwarded(device):
+    assert device.stage is not None and device.stage.name == "OSMS26"
+    assert not device.is_homed(1)
+    device.move_stage_to_mechanical_origin((True, False))
+    wait_for(lambda: device.is_homed(1))
+    assert device.origin_offsets[0] == 0.0
+    assert not device.ensure_mechanical_origin((True, False))
+
+
+def test_dead_host_is_restarted(device, tmp_path):
+    (tmp_path / "crash").touch()
+    with pytest.raises(serialutil.SerialException):
+        device.get_speed()
+    (tmp_path / "crash").unlink()
+    device.move_stages((50, None), "A")
+    assert device.restarts == 1
+    wait_for(lambda: device.measure_positions()[0] == 50)
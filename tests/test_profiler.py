@@ -0,0 +1,93 @@
+from pyautolab_OptoSigma.helper.profiler import GUI, IDLE, MOTION_WAIT, SERIAL, RunProfiler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def started(clock: FakeClock) -> RunProfiler:
+    profiler = RunProfiler(clock)
+    profiler.enable()
+    profiler.begin("step")
+    return profiler
+
+
+def test_timer_lateness_is_gui_time() -> None:
+    clock = FakeClock()
+    profiler = started(clock)
+    profiler.start_timer("step", 0.1)
+    # Due at 0.1, entered at 0.25: 0.15 sec of other GUI work
+    clock.now = 0.25
+    with profiler.timer_slot("step"):
+        profiler.set_state(MOTION_WAIT)
+        clock.now = 0.26
+    # Next tick was due at 0.35 as the timer fell behind, entered on time
+    clock.now = 0.35
+    with profiler.timer_slot("step"):
+        with profiler.span(SERIAL):
+            clock.now = 0.37
+    profiler.end()
+    breakdown = profiler.breakdown()
+    assert round(breakdown[GUI], 6) == 0.16
+    assert round(breakdown[IDLE], 6) == 0.1
+    assert round(breakdown[MOTION_WAIT], 6) == 0.09
+    assert round(breakdown[SERIAL], 6) == 0.02
+    assert [event["name"] for event in profiler.events if event["cat"] == GUI] == [
+        "step lateness",
+        "step",
+        "step",
+    ]
+
+
+def test_slot_running_past_its_tick_is_not_late() -> None:
+    clock = FakeClock()
+    profiler = started(clock)
+    profiler.start_timer("step", 0.1)
+    clock.now = 0.1
+    with profiler.timer_slot("step"):
+        clock.now = 0.5
+    # Due at 0.2 but the slot returned at 0.5, and the event loop took 0.01 sec more
+    clock.now = 0.51
+    with profiler.timer_slot("step"):
+        pass
+    profiler.end()
+    assert round(profiler.breakdown()[GUI], 6) == 0.41
+
+
+def test_end_closes_open_spans() -> None:
+    clock = FakeClock()
+    profiler = started(clock)
+    profiler.start_timer("step", 0.1)
+    clock.now = 0.1
+    with profiler.timer_slot("step"):
+        clock.now = 0.3
+        profiler.end()
+        clock.now = 0.4
+    assert round(profiler.breakdown()[GUI], 6) == 0.2
+    assert [round(event["dur"]) for event in profiler.events if event["name"] == "step"] == [200000]
+
+
+def test_nothing_is_recorded_between_runs() -> None:
+    clock = FakeClock()
+    profiler = started(clock)
+    clock.now = 0.1
+    profiler.end()
+    events, totals = list(profiler.events), profiler.breakdown()
+    # Polls of the stage control manager after the run
+    for _ in range(3):
+        with profiler.span(GUI, "poll"), profiler.span(SERIAL, b"Q:"):
+            clock.now += 0.1
+        profiler.set_state(MOTION_WAIT)
+        profiler.operation(0)
+    profiler.disable()
+    assert profiler.events == events
+    assert profiler.breakdown() == totals
+    profiler.enable()
+    profiler.begin("step")
+    with profiler.span(SERIAL, b"Q:"):
+        clock.now += 0.1
+    assert [event["name"] for event in profiler.events] == ["Q:"]
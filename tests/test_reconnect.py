@@ -0,0 +1,106 @@
+import pytest
+
+pytest.importorskip("pyautolab")
+serialutil = pytest.importorskip("serial.serialutil")
+
+from conftest import connect as connect_simulated  # noqa: E402
+from pyautolab_OptoSigma.helper.simulator import SimulatedSerial  # noqa: E402
+from pyautolab_OptoSigma.hsc103.driver import Hsc103  # noqa: E402
+from pyautolab_OptoSigma.shot702.driver import Shot702  # noqa: E402
+
+
+class DroppingSerial(SimulatedSerial):
+    """Simulator whose port drops once on a chosen message and optionally power-cycles."""
+
+    def __init__(self, model: str) -> None:
+        super().__init__(model, time_scale=1e6)
+        self.drop_at: int | None = None
+        self.power_cycle = False
+        self.unplugged = False
+
+    def open(self) -> None:
+        if self.unplugged:
+            raise serialutil.SerialException("no such port")
+        if self.power_cycle:
+            self.power_cycle = False
+            port = self.port
+            super().__init__(self.model, time_scale=1e6)
+            self.drop_at = None
+            self.port = port
+        super().open()
+
+    def write(self, data: bytes) -> int:
+        if self.message_count + 1 == self.drop_at:
+            self.drop_at = None
+            self.message_count += 1
+            raise serialutil.SerialException("dropped")
+        return super().write(data)
+
+    def drop_next(self) -> None:
+        self.drop_at = self.message_count + 1
+
+
+def connect(driver):
+    device = connect_simulated(driver, serial=DroppingSerial(driver.__name__))
+    device.RECONNECT_INTERVAL = 0.0
+    return device
+
+
+def wait(device) -> None:
+    while not all(device.is_ready()):
+        pass
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_absolute_move_is_retried(driver) -> None:
+    device = connect(driver)
+    device._ser.drop_next()
+    device.move_stages((300, None, None))
+    wait(device)
+    assert device.measure_positions()[0] == 300
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_relative_move_is_not_retried(driver) -> None:
+    device = connect(driver)
+    device._ser.drop_next()
+    with pytest.raises(serialutil.SerialException):
+        device.move_stages((50, None, None), "M")
+    wait(device)
+    assert device.measure_positions()[0] == 0
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_drop_at_logical_zero_is_not_a_reset(driver) -> None:
+    device = connect(driver)
+    device.move_stages((100, None, None))
+    wait(device)
+    device.measure_positions()
+    device.fix_origin((True, False, False))
+    device._ser.drop_next()
+    assert device.measure_positions()[0] == 0
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_power_cycle_is_detected(driver) -> None:
+    device = connect(driver)
+    speed = device.get_speed()
+    device.origin_offsets = [0.0] * device.AXES
+    device._ser.drop_next()
+    device._ser.power_cycle = True
+    with pytest.raises(serialutil.SerialException, match="reset"):
+        device.measure_positions()
+    assert device.origin_offsets == [None] * device.AXES
+    # The configuration is restored nevertheless
+    assert device.get_speed() == speed
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_close_on_unplugged_port(driver) -> None:
+    device = connect(driver)
+    device.RECONNECT_TIMEOUT = 0.0
+    device.origin_offsets = [0.0] * device.AXES
+    device._ser.drop_next()
+    device._ser.unplugged = True
+    device.close()
+    assert not device._ser.is_open
@@ -0,0 +1,150 @@
+import os
+import socket
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pyautolab")
+serialutil = pytest.importorskip("serial.serialutil")
+
+from pyautolab_OptoSigma.helper import storage  # noqa: E402
+from pyautolab_OptoSigma.helper.server import (  # noqa: E402
+    RemoteStageController,
+    StageServer,
+    receive_frame,
+    send_frame,
+)
+from pyautolab_OptoSigma.helper.simulator import simulate  # noqa: E402
+from pyautolab_OptoSigma.hsc103.driver import Hsc103  # noqa: E402
+
+needs_unix_socket = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets are not available")
+
+
+class SimulatedHsc103(Hsc103):
+    """Simulated Hsc103 whose port is the directory holding its state, for servers in another process."""
+
+    def open(self) -> None:
+        storage.STATE_DIR = Path(self.port)
+        simulate(self, time_scale=1e6)
+        super().open()
+
+
+@pytest.fixture
+def server():
+    device = Hsc103()
+    device.port = "loopback"
+    simulate(device, time_scale=1e6)
+    device.open()
+    server = StageServer(device, poll_interval=0.01)
+    server.start()
+    yield server
+    server.close()
+    device.close()
+
+
+def subscribe(address) -> socket.socket:
+    sock = socket.create_connection(address, timeout=5.0)
+    assert "hello" in receive_frame(sock)
+    send_frame(sock, {"id": 1, "subscribe": True})
+    # Statuses may arrive before the reply to the subscription
+    while "status" in (message := receive_frame(sock)):
+        pass
+    assert message["id"] == 1
+    return sock
+
+
+def receive_statuses(sock: socket.socket, count: int) -> dict[int, dict]:
+    statuses = {}
+    while len(statuses) < count:
+        status = receive_frame(sock)["status"]
+        statuses[status["seq"]] = status
+    return statuses
+
+
+def serial_messages_per_poll(server: StageServer, polls: int) -> float:
+    def sample() -> tuple[int, int]:
+        with server._device_lock:
+            return server._seq, server._device._ser.message_count
+
+    first_seq, first_count = sample()
+    while server._seq < first_seq + polls:
+        time.sleep(0.005)
+    seq, count = sample()
+    return (count - first_count) / (seq - first_seq)
+
+
+def test_one_poll_reaches_every_client(server) -> None:
+    clients = [subscribe(server.address) for _ in range(3)]
+    try:
+        received = [receive_statuses(client, 20) for client in clients]
+        common = set.intersection(*(set(statuses) for statuses in received))
+        assert len(common) >= 10
+        for seq in common:
+            assert received[0][seq] == received[1][seq] == received[2][seq]
+    finally:
+        for client in clients:
+            client.close()
+
+
+def test_serial_traffic_does_not_grow_with_clients(server) -> None:
+    clients = [subscribe(server.address)]
+    try:
+        one_client = serial_messages_per_poll(server, 20)
+        clients += [subscribe(server.address) for _ in range(4)]
+        five_clients = serial_messages_per_poll(server, 20)
+        # One position query and one ready query per poll
+        assert one_client == five_clients == 2
+    finally:
+        for client in clients:
+            client.close()
+
+
+def test_failing_call_keeps_the_connection(server, monkeypatch) -> None:
+    def fail() -> None:
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(server._device, "get_speed", fail)
+    remote = RemoteStageController(server.address)
+    remote.open()
+    try:
+        with pytest.raises(serialutil.SerialException, match="RuntimeError: broken"):
+            remote.get_speed()
+        remote.move_stages((100, None, None))
+        assert remote.measure_positions()[0] == 100
+    finally:
+        remote.close()
+
+
+def test_remote_without_server_is_refused(tmp_path) -> None:
+    remote = RemoteStageController(str(tmp_path / "missing"))
+    with pytest.raises(serialutil.SerialException, match="No stage server"):
+        remote.open()
+
+
+@needs_unix_socket
+def test_unix_socket_path_is_reused(server, tmp_path) -> None:
+    path = str(tmp_path / "stage.sock")
+    for _ in range(2):
+        unix_server = StageServer(server._device, path)
+        unix_server.start()
+        unix_server.close()
+    assert not os.path.exists(path)
+
+
+@needs_unix_socket
+def test_remote_starts_and_stops_its_server(tmp_path, monkeypatch) -> None:
+    # The server process imports this module and the package
+    paths = [str(Path(__file__).parent), str(Path(__file__).parents[1]), os.environ.get("PYTHONPATH", "")]
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(paths))
+    path = str(tmp_path / "stage.sock")
+    remote = RemoteStageController(path, class_path=f"{__name__}:SimulatedHsc103")
+    remote.port = str(tmp_path)
+    remote.open()
+    try:
+        assert remote.model == "SimulatedHsc103"
+        remote.move_stages((100, None, None))
+        assert remote.measure_positions()[0] == 100
+    finally:
+        remote.close()
+    assert not os.path.exists(path)
@@ -0,0 +1,105 @@
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("pyautolab")
+pytest.importorskip("serial")
+
+from conftest import connect as connect_simulated  # noqa: E402
+from pyautolab_OptoSigma.helper.tuning import (  # noqa: E402
+    TuningResult,
+    measure_setting,
+    pareto_front,
+    tune_stage_speed,
+)
+from pyautolab_OptoSigma.hsc103.driver import Hsc103  # noqa: E402
+from pyautolab_OptoSigma.shot702.driver import Shot702  # noqa: E402
+
+
+def connect(driver):
+    return connect_simulated(driver, speed=(500, 5000, 100))
+
+
+@pytest.mark.parametrize("driver", [Shot702, Hsc103])
+def test_negative_positions(driver) -> None:
+    device = connect(driver)
+    device.move_stages((-100, None, None))
+    while not all(device.is_ready()):
+        pass
+    assert device.measure_positions()[0] == -100
+
+
+def test_shot702_reply_format() -> None:
+    device = connect(Shot702)
+    device.move_stages((-100, None, None))
+    assert device._ser.send_query_bytes(b"Q:\r\n").startswith(b"-     1000,         0,K,K,")
+
+
+def test_return_speed_leaves_speed() -> None:
+    device = connect(Hsc103)
+    device.set_stage_speed(1, 1000, 3000, 200, None, mode="B")
+    assert device.get_speed()[0] == [500, 5000, 100]
+    assert device._ser._axes[0].return_speed == (100000, 300000, 200)
+
+
+def test_tuning_refuses_unknown_stage_before_the_sweep() -> None:
+    device = connect(Hsc103)
+    device.stage = None
+    count = device._ser.message_count
+    with pytest.raises(ValueError):
+        tune_stage_speed(device, 1, (1000, 2000), (100,))
+    assert device._ser.message_count == count
+
+
+def test_tuning_restores_the_speed() -> None:
+    device = connect(Hsc103)
+    speed = device.get_speed()
+    front = tune_stage_speed(device, 1, (1000, 2000), (100,), moves=(10,), save=False)
+    assert front
+    assert device.get_speed() == speed
+
+
+def test_measure_setting_returns_to_start() -> None:
+    device = connect(Shot702)
+    result = measure_setting(device, 1, 500, 2000, 100, moves=(10, 100), settle_window=0.0)
+    assert device.get_speed()[0] == [500, 2000, 100]
+    assert device.measure_positions()[0] == 0
+    # The simulator, like the open-loop counter of the controller, ends at the commanded position
+    assert result.arrival_error == 0.0
+    assert (result.start_speed, result.max_speed, result.acceleration_time) == (500, 2000, 100)
+
+
+def test_pareto_front() -> None:
+    fast = TuningResult(500, 5000, 50, move_time=0.1, arrival_error=0.5, settle_time=0.0)
+    accurate = TuningResult(500, 1000, 200, move_time=0.3, arrival_error=0.0, settle_time=0.0)
+    dominated = TuningResult(500, 2000, 200, move_time=0.4, arrival_error=0.5, settle_time=0.0)
+    duplicate = TuningResult(500, 1000, 300, move_time=0.3, arrival_error=0.0, settle_time=0.0)
+    assert pareto_front([accurate, dominated, fast, duplicate]) == [fast, accurate, duplicate]
+
+
+def test_drivers_of_one_model_in_two_threads() -> None:
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    devices = [connect(Hsc103), connect(Hsc103)]
+    devices[1].move_stages((-250, None, None))
+    while not all(devices[1].is_ready()):
+        pass
+    expected = [device.measure_positions() for device in devices]
+    assert expected[0] != expected[1]
+    mismatches = [0, 0]
+
+    def poll(index: int) -> None:
+        for _ in range(20000):
+            if devices[index].measure_positions() != expected[index]:
+                mismatches[index] += 1
+
+    threads = [threading.Thread(target=poll, args=(index,)) for index in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert mismatches == [0, 0]
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from pyautolab_OptoSigma.helper.timing import TimingRecorder, timing_directory
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def recorder(clock: FakeClock) -> TimingRecorder:
+    timing = TimingRecorder(stop_time=1.0, first_delay=0.05, clock=clock)
+    clock.now = 10.0
+    timing.begin()
+    return timing
+
+
+def test_commanded_start_follows_the_previous_start() -> None:
+    clock = FakeClock()
+    timing = recorder(clock)
+    for started in (10.06, 11.08, 12.08):
+        clock.now = started
+        timing.mark_start()
+    # The first one is due after the first delay, the others after the stop time
+    assert timing.commanded == pytest.approx([0.05, 1.06, 2.08])
+    assert timing.started == pytest.approx([0.06, 1.08, 2.08])
+    summary = timing.summary()
+    assert summary.operations == 3
+    assert summary.total_overhead == pytest.approx(0.03)
+    assert summary.elapsed == pytest.approx(2.08)
+
+
+def test_busy_counts_only_after_the_stop_time() -> None:
+    clock = FakeClock()
+    timing = recorder(clock)
+    timing.mark_busy()
+    timing.mark_start()
+    timing.mark_busy()
+    assert timing.busy == [0]
+    with timing.dwelling():
+        clock.now += 1.0
+    timing.mark_busy()
+    timing.mark_busy()
+    assert timing.busy == [2]
+    timing.mark_start()
+    assert timing.summary().move_bound == 1
+
+
+def test_ready_keeps_the_first_observation() -> None:
+    clock = FakeClock()
+    timing = recorder(clock)
+    timing.mark_start()
+    clock.now += 0.2
+    timing.mark_ready()
+    clock.now += 0.2
+    timing.mark_ready()
+    assert timing.summary().move_duration["max"] == pytest.approx(200.0)
+
+
+def test_percentiles() -> None:
+    clock = FakeClock()
+    timing = recorder(clock)
+    # Start jitter of 0, 1, ..., 99 msec
+    for jitter in range(100):
+        clock.now = 10.0 + (timing.started[-1] + 1.0 if timing.started else 0.05) + jitter / 1000
+        timing.mark_start()
+    start_jitter = timing.summary().start_jitter
+    assert start_jitter["p50"] == pytest.approx(49.5)
+    assert start_jitter["p90"] == pytest.approx(89.1)
+    assert start_jitter["p99"] == pytest.approx(98.01)
+    assert start_jitter["max"] == pytest.approx(99.0)
+
+
+def test_empty_summary() -> None:
+    summary = recorder(FakeClock()).summary()
+    assert summary.operations == 0
+    assert summary.start_jitter == {}
+
+
+def test_report_is_saved(tmp_path) -> None:
+    clock = FakeClock()
+    timing = recorder(clock)
+    clock.now = 10.05
+    timing.mark_start()
+    path = timing.save(tmp_path, "step")
+    report = json.loads(path.read_text(encoding="utf-8"))
+    assert report["summary"]["operations"] == 1
+    assert report["operations"][0]["ready"] is None
+
+
+def test_default_directory_follows_the_state_directory(state_dir) -> None:
+    assert timing_directory("") == state_dir / "timing"
+    assert timing_directory("~/reports").name == "reports"